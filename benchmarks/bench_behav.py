@@ -0,0 +1,70 @@
+"""
+Survey loading and scoring benchmarks (lsan_tools.behav).
+"""
+import os
+
+from lsan_tools.behav import survey
+
+from datasets import make_panel
+from common import data_dir
+
+SIZES = [1000, 10000, 100000, 1000000]
+QUICK_SIZES = [1000, 10000]
+SCORE_METHODS = ['score_hexaco', 'score_rel_mobility', 'score_isel', 'score_dospert',
+                 'score_stab', 'score_iri', 'score_ppi_short', 'score_ppi_long']
+
+def panel_file(n_respondents):
+    # written once per size and reused across benchmarks and runs
+    filename = os.path.join(data_dir(), f"panel_{n_respondents}.csv")
+    if not os.path.exists(filename):
+        make_panel(n_respondents, missing=0.02).to_csv(filename + '.tmp')
+        os.replace(filename + '.tmp', filename)
+    return filename
+
+class SurveyLoad(object):
+    params = [SIZES]
+    quick_params = [QUICK_SIZES]
+    param_names = ['n_respondents']
+
+    def setup(self, n_respondents):
+        self.filename = panel_file(n_respondents)
+
+    def time_load(self, n_respondents):
+        survey(self.filename, 'PIN')
+
+    def time_load_two_scales(self, n_respondents):
+        survey(self.filename, 'PIN', scales=['hexaco', 'iri'])
+
+class SurveyScale(object):
+    params = [SIZES, SCORE_METHODS]
+    quick_params = [QUICK_SIZES, SCORE_METHODS]
+    param_names = ['n_respondents', 'method']
+
+    def setup(self, n_respondents, method):
+        self.survey = survey(panel_file(n_respondents), 'PIN')
+
+    def time_score(self, n_respondents, method):
+        getattr(self.survey, method)()
+
+class SurveyPipeline(object):
+    params = [SIZES]
+    quick_params = [QUICK_SIZES]
+    param_names = ['n_respondents']
+
+    def setup(self, n_respondents):
+        self.survey = survey(panel_file(n_respondents), 'PIN')
+        self.survey.score_all()
+        self.output = os.path.join(data_dir(), f"scored_{n_respondents}")
+
+    def teardown(self, n_respondents):
+        if os.path.exists(self.output + '.csv'):
+            os.remove(self.output + '.csv')
+
+    def time_score_all(self, n_respondents):
+        self.survey.score_all()
+
+    def time_validate_items(self, n_respondents):
+        self.survey.validate_items()
+
+    def time_join_data(self, n_respondents):
+        self.survey.join_data(filename=self.output)
@@ -0,0 +1,58 @@
+"""
+Pairwise similarity and permutation benchmarks (lsan_tools.math).
+"""
+import numpy as np
+import pandas as pd
+
+from lsan_tools import math
+
+from datasets import make_subject_vector
+
+SIZES = [1000, 5000, 20000]
+QUICK_SIZES = [1000, 5000]
+TYPES = ['absolute-dist', 'average', 'low-alike', 'high-alike']
+
+class Pairwise(object):
+    params = [SIZES, TYPES]
+    quick_params = [QUICK_SIZES, ['absolute-dist']]
+    param_names = ['n_subs', 'type']
+
+    def setup(self, n_subs, type):
+        self.behav_vct = make_subject_vector(n_subs)
+
+    def time_get_pairwise_condensed(self, n_subs, type):
+        math.get_pairwise(self.behav_vct, type, return_mtx=False)
+
+    def time_get_pairwise_float32(self, n_subs, type):
+        math.get_pairwise(self.behav_vct, type, return_mtx=False, dtype=np.float32)
+
+    def time_get_pairwise_topk(self, n_subs, type):
+        math.get_pairwise_topk(self.behav_vct, 10, type)
+
+class PairwiseMatrix(object):
+    # full n x n float64 matrix (20k subjects would need 3.2 GB)
+    params = [SIZES[:2], TYPES]
+    quick_params = [QUICK_SIZES, ['absolute-dist']]
+    param_names = ['n_subs', 'type']
+
+    def setup(self, n_subs, type):
+        self.behav_vct = make_subject_vector(n_subs)
+
+    def time_get_pairwise(self, n_subs, type):
+        math.get_pairwise(self.behav_vct, type)
+
+class Shuffle(object):
+    params = [SIZES]
+    quick_params = [QUICK_SIZES]
+    param_names = ['n_subs']
+
+    def setup(self, n_subs):
+        rng = np.random.default_rng(0)
+        self.data = pd.DataFrame(rng.normal(size=(n_subs, 20)),
+                                 index=pd.Index(np.arange(n_subs), name='PIN'))
+
+    def time_shuffle_pandas(self, n_subs):
+        math.shuffle(self.data, random_state=0)
+
+    def time_shuffle_numpy(self, n_subs):
+        math.shuffle(self.data, type="numpy", random_state=0)
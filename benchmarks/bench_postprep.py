@@ -0,0 +1,59 @@
+"""
+BIDS indexing and events/timing benchmarks (lsan_tools.fmri.postprep).
+"""
+import os
+import shutil
+
+from lsan_tools.fmri.postprep import events_class
+
+from datasets import make_bids_tree
+from common import data_dir
+
+SIZES = [10, 100, 1000]
+QUICK_SIZES = [10, 100]
+TASK = 'faces'
+
+def bids_dir(n_subs):
+    # written once per size and reused across benchmarks and runs
+    root = os.path.join(data_dir(), f"bids_{n_subs}")
+    if not os.path.exists(os.path.join(root, 'dataset_description.json')):
+        shutil.rmtree(root, ignore_errors=True)
+        make_bids_tree(root + '.tmp', n_subs, task=TASK)
+        os.replace(root + '.tmp', root)
+    return root
+
+class EventsLayout(object):
+    params = [SIZES]
+    quick_params = [QUICK_SIZES]
+    param_names = ['n_subs']
+
+    def setup(self, n_subs):
+        self.base_dir = bids_dir(n_subs)
+
+    def time_layout(self, n_subs):
+        events_class(self.base_dir, TASK, verbose=False)
+
+    def time_layout_events_only(self, n_subs):
+        events_class(self.base_dir, TASK, verbose=False, events_only=True)
+
+class EventsTiming(object):
+    params = [SIZES]
+    quick_params = [QUICK_SIZES]
+    param_names = ['n_subs']
+
+    def setup(self, n_subs):
+        self.events = events_class(bids_dir(n_subs), TASK, verbose=False)
+        self.events.get_events_table()
+        self.output_dir = os.path.join(data_dir(), f"timing_{n_subs}")
+
+    def teardown(self, n_subs):
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def time_get_events_table(self, n_subs):
+        self.events.get_events_table()
+
+    def time_get_timing(self, n_subs):
+        self.events.get_timing(output_dir=self.output_dir)
+
+    def time_gen_DesignMat(self, n_subs):
+        self.events.gen_DesignMat(TR=2.0, n_scans=160)
@@ -0,0 +1,11 @@
+"""
+Helpers shared by the benchmark modules.
+"""
+import os
+import tempfile
+
+def data_dir():
+    # synthetic data are cached between runs (LSAN_BENCHMARK_DATA to override)
+    path = os.environ.get('LSAN_BENCHMARK_DATA', os.path.join(tempfile.gettempdir(), 'lsan_benchmarks'))
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,54 @@
+"""
+Synthetic data for the benchmarks: wide Likert panels for every registered
+survey scale, BIDS trees with *_events.tsv files, and subject score vectors.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from lsan_tools.behav import SCALES
+
+def make_panel(n_respondents, seed=0, missing=0.0):
+    # Likert responses for every registered scale, plus a demographic column
+    rng = np.random.default_rng(seed)
+    columns, items = [], []
+    for scale_name, scale in SCALES.items():
+        for i in range(1, scale['n_items'] + 1):
+            columns.append(f"{scale_name}_{i}")
+            items.append(rng.integers(scale['min'], scale['max'] + 1, size=n_respondents))
+    items = np.column_stack(items)
+    if missing:
+        items = np.where(rng.random(items.shape) < missing, np.nan, items)
+
+    data = pd.DataFrame(items, columns=columns, index=pd.Index(np.arange(n_respondents), name='PIN'))
+    data['age'] = rng.integers(18, 80, size=n_respondents)
+    return data
+
+def make_bids_tree(root, n_subs, n_runs=2, task='faces', n_trials=40, seed=0):
+    # events files plus empty bold files and sidecars, enough for BIDSLayout
+    rng = np.random.default_rng(seed)
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, 'dataset_description.json'), 'w') as f:
+        json.dump({'Name': 'synthetic', 'BIDSVersion': '1.4.0'}, f)
+
+    for sub in range(1, n_subs + 1):
+        func_dir = os.path.join(root, f"sub-{sub:04d}", 'func')
+        os.makedirs(func_dir, exist_ok=True)
+        for run in range(1, n_runs + 1):
+            base = os.path.join(func_dir, f"sub-{sub:04d}_task-{task}_run-{run:02d}")
+            events = pd.DataFrame({'onset': np.sort(rng.uniform(10, 300, n_trials)).round(2),
+                                   'duration': rng.choice([1.0, 2.0], n_trials),
+                                   'trial_type': rng.choice(['happy', 'sad', 'neutral'], n_trials),
+                                   'response': rng.choice(['left', 'right'], n_trials)})
+            events.to_csv(base + '_events.tsv', sep='\t', index=False)
+            open(base + '_bold.nii.gz', 'wb').close()
+            with open(base + '_bold.json', 'w') as f:
+                json.dump({'RepetitionTime': 2.0, 'TaskName': task}, f)
+    return root
+
+def make_subject_vector(n_subs, seed=0):
+    # one (total) score per subject, e.g., a scale mean
+    rng = np.random.default_rng(seed)
+    return rng.normal(3, 1, size=n_subs)
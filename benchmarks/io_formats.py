@@ -0,0 +1,43 @@
+"""
+Compares loading and scoring survey exports stored as .csv, .xlsx, .parquet
+and .feather with lsan_tools.behav.survey.
+
+Usage: python benchmarks/io_formats.py [n_respondents]
+"""
+import os
+import sys
+import tempfile
+import time
+
+# this checkout of lsan_tools (installed or not)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lsan_tools.behav import survey
+
+from datasets import make_panel
+
+def time_load(filename, **kwargs):
+    start = time.perf_counter()
+    loaded = survey(filename, 'PIN', **kwargs)
+    load_time = time.perf_counter() - start
+    loaded.score_all()
+    return load_time, time.perf_counter() - start
+
+if __name__ == '__main__':
+    n_respondents = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    data = make_panel(n_respondents)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        base = os.path.join(tmp_dir, 'panel')
+        data.to_csv(base + '.csv')
+        data.to_excel(base + '.xlsx', sheet_name='panel')
+        data.to_parquet(base + '.parquet')
+        data.reset_index().to_feather(base + '.feather')
+
+        print(f"{n_respondents} respondents, {data.shape[1]} columns")
+        print(f"{'format':<10}{'load (s)':>12}{'load+score (s)':>16}{'2 scales (s)':>14}")
+        for ext in ['.csv', '.xlsx', '.parquet', '.feather']:
+            kwargs = {'xlsx_args': {'sheet_name': 'panel'}} if ext == '.xlsx' else {}
+            load_time, total_time = time_load(base + ext, **kwargs)
+            pruned_time, _ = time_load(base + ext, scales=['hexaco', 'iri'], **kwargs)
+            print(f"{ext[1:]:<10}{load_time:>12.3f}{total_time:>16.3f}{pruned_time:>14.3f}")
@@ -0,0 +1,145 @@
+"""
+Runs the benchmark suite and saves timings and peak memory as JSON.
+
+Benchmarks follow asv conventions (classes with params, param_names,
+setup/teardown and time_* methods in bench_*.py), so they can also be run
+with asv. By default the smaller `quick_params` sizes are used; --full runs
+all sizes (1k-1M respondents, 10-1000 subjects, up to 20k pairwise subjects).
+
+Usage:
+    python benchmarks/run.py [--full] [--bench REGEX] [--repeat N] [--output results.json]
+    python benchmarks/run.py --compare old.json new.json
+
+Synthetic data are cached in $LSAN_BENCHMARK_DATA (default: <tmp>/lsan_benchmarks).
+"""
+import argparse
+import datetime
+import glob
+import importlib
+import inspect
+import itertools
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BENCH_DIR, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    import numpy, pandas
+    import lsan_tools
+    return {'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': commit,
+            'python': platform.python_version(),
+            'numpy': numpy.__version__,
+            'pandas': pandas.__version__,
+            'lsan_tools': getattr(lsan_tools, '__version__', None),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count()}
+
+def _benchmarks(pattern=None):
+    # yields (name, class, method name) for every time_* method in bench_*.py
+    for filename in sorted(glob.glob(os.path.join(BENCH_DIR, 'bench_*.py'))):
+        module = importlib.import_module(os.path.basename(filename)[:-3])
+        for class_name, bench_class in inspect.getmembers(module, inspect.isclass):
+            if bench_class.__module__ != module.__name__:
+                continue
+            for method in sorted(m for m in dir(bench_class) if m.startswith('time_')):
+                name = f"{module.__name__}.{class_name}.{method}"
+                if pattern is None or re.search(pattern, name):
+                    yield name, bench_class, method
+
+def _measure(function, repeat):
+    # first call: peak memory (tracemalloc); then timed calls without tracing
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    function()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return times, peak_memory
+
+def run(full=False, pattern=None, repeat=3):
+    results = []
+    for name, bench_class, method in _benchmarks(pattern):
+        params = bench_class.params if full else getattr(bench_class, 'quick_params', bench_class.params)
+        for param_values in itertools.product(*params):
+            param_dict = dict(zip(bench_class.param_names, param_values))
+            bench = bench_class()
+            try:
+                if hasattr(bench, 'setup'):
+                    bench.setup(*param_values)
+            except NotImplementedError:
+                continue
+
+            try:
+                times, peak_memory = _measure(lambda: getattr(bench, method)(*param_values), repeat)
+            finally:
+                if hasattr(bench, 'teardown'):
+                    bench.teardown(*param_values)
+
+            times_sorted = sorted(times)
+            result = {'name': name, 'params': param_dict, 'times': times,
+                      'min': times_sorted[0], 'median': times_sorted[len(times) // 2],
+                      'peak_memory': peak_memory}
+            results.append(result)
+            print(f"{name} {param_dict}: {result['median']:.4f} s, {peak_memory / 2**20:.1f} MiB", flush=True)
+    return results
+
+def compare(old_file, new_file, threshold=1.1):
+    # prints median time ratios (new / old) for benchmarks in both files
+    with open(old_file, 'r') as f:
+        old = {(r['name'], json.dumps(r['params'], sort_keys=True)): r for r in json.load(f)['results']}
+    with open(new_file, 'r') as f:
+        new = json.load(f)['results']
+
+    slower = 0
+    print(f"{'ratio':>7} {'old (s)':>9} {'new (s)':>9}  benchmark")
+    for result in new:
+        key = (result['name'], json.dumps(result['params'], sort_keys=True))
+        if key not in old:
+            continue
+        ratio = result['median'] / old[key]['median']
+        flag = ' *' if ratio > threshold else ''
+        slower += ratio > threshold
+        print(f"{ratio:>7.2f} {old[key]['median']:>9.4f} {result['median']:>9.4f}  {key[0]} {key[1]}{flag}")
+    print(f"{slower} benchmark(s) slower by more than {threshold - 1:.0%}")
+    return slower
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run lsan_tools benchmarks.")
+    parser.add_argument('--full', action='store_true', help="run all sizes instead of quick_params")
+    parser.add_argument('--bench', default=None, help="only run benchmarks whose name matches this regex")
+    parser.add_argument('--repeat', type=int, default=3, help="timed calls per benchmark")
+    parser.add_argument('--output', default='benchmark_results.json', help="JSON file for the results")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="compare two result files")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        # non-zero exit status if anything got slower (e.g., for nightly runs)
+        sys.exit(1 if compare(*args.compare) else 0)
+
+    # benchmark modules, and this checkout of lsan_tools (installed or not)
+    sys.path[:0] = [BENCH_DIR, os.path.dirname(BENCH_DIR)]
+    results = run(args.full, args.bench, args.repeat)
+    with open(args.output, 'w') as f:
+        json.dump({'metadata': _metadata(), 'results': results}, f, indent=1)
+    print(f"saved {len(results)} results to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,26 @@
-from .behav import survey
-from .fmri import postprep
-from . import utils, math
\ No newline at end of file
+import importlib
+
+__all__ = ['survey', 'postprep', 'behav', 'fmri', 'utils', 'math', 'cli', 'instrument']
+
+# Submodules (and their third-party dependencies) are only imported on first
+# access, so e.g. `from lsan_tools.behav import survey` doesn't load pybids.
+_lazy_attrs = {'survey': ('.behav', 'survey'),
+               'postprep': ('.fmri.postprep', None)}
+_lazy_submodules = ['behav', 'fmri', 'utils', 'math', 'cli', 'instrument']
+
+def __getattr__(name):
+    if name in _lazy_attrs:
+        module_name, attr = _lazy_attrs[name]
+        value = importlib.import_module(module_name, __name__)
+        if attr is not None:
+            value = getattr(value, attr)
+    elif name in _lazy_submodules:
+        value = importlib.import_module('.' + name, __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -1,23 +1,417 @@
 import os
+import re
+import json
+import hashlib
+import numpy as np
 import pandas as pd 
 pd.options.mode.chained_assignment = None
 
-__all__ = ['select_data',
+from .instrument import stage
+
+__all__ = ['SCALES',
+           'register_scale',
+           'score_csv_in_chunks',
+           'select_data',
            'scorer',
            'check_total_items',
            'retain_items',
            'join_data',
+           'score_cohorts',
+           'item_hashes',
+           'score_incremental',
+           'memory_report',
+           'validate_items',
+           'score_all',
            'score_hexaco',
            'score_rel_mobility',
            'score_isel',
            'score_dospert',
            'score_stab',
            'score_iri',
-           'score_ppi_short'
+           'score_ppi_short',
+           'score_ppi_long'
            ]
 
 __author__ = ["Shawn Rhoads","Katherine O'Connell","Kathryn Berluti"]
 
+# Scale definitions used by the survey.score_* methods and survey.score_all().
+# Items are named f"{scale_name}_{item}" (items numbered from 1); reversed
+# items are scored as (max + min) - response; each subscale is the sum of
+# its items, divided by the number of items if calc_mean is True.
+SCALES = {}
+
+# HEXACO Personality Inventory (60-item)
+SCALES['hexaco'] = {
+    'n_items': 60,
+    'min': 1,
+    'max': 5,
+    'reversed': [30, 12, 60, 42, 24, 48, 53, 35, 41, 59, 28, 52, 10, 46, 9, 15, 57, 21, 26, 32, 14, 20, 44, 56, 1, 31, 49, 19, 55],
+    'subscales': {
+        'honestyhumility': [6, 30, 54, 12, 36, 60, 18, 42, 24, 48],
+        'emotionality': [5, 29, 53, 11, 35, 17, 41, 23, 47, 59],
+        'extraversion': [4, 28, 52, 10, 34, 58, 16, 40, 22, 46],
+        'agreeableness': [3, 27, 9, 33, 51, 15, 39, 57, 21, 45],
+        'conscientiousness': [2, 26, 8, 32, 14, 38, 50, 20, 44, 56],
+        'openness': [1, 25, 7, 31, 13, 37, 49, 19, 43, 55],
+    },
+    'calc_mean': True,
+}
+
+# Relational Mobility Scale (12-item)
+SCALES['relational_mobility'] = {
+    'n_items': 12,
+    'min': 1,
+    'max': 6,
+    'reversed': [4, 5, 7, 9, 11, 12],
+    'subscales': {
+        'relational_mobility': list(range(1,13)),
+    },
+    'calc_mean': True,
+}
+
+# Interpersonal Support Evaluation List (40-item)
+SCALES['isel'] = {
+    'n_items': 40,
+    'min': 0,
+    'max': 4,
+    'reversed': [3, 6, 9, 10, 11, 13, 14, 15, 17, 24, 25, 27, 28, 29, 30, 34, 35, 36, 39, 40],
+    'subscales': {
+        'appraisal': [1, 6, 11, 17, 19, 22, 26, 30, 36, 38],
+        'tangible': [2, 9, 14, 16, 18, 23, 29, 33, 35, 39],
+        'selfesteem': [3, 4, 8, 13, 20, 24, 28, 32, 37, 40],
+        'belonging': [5, 7, 10, 12, 15, 21, 25, 27, 31, 34],
+    },
+    'calc_mean': False,
+}
+
+# Domain-Specific Risk-Taking (DOSPERT) Scale (60-item); scale = 1:7
+SCALES['dospert'] = {
+    'n_items': 60,
+    'min': 1,
+    'max': 7,
+    'reversed': [],
+    'subscales': {
+        'risk_taking_ethical': [6, 9, 10, 16, 29, 30],
+        'risk_taking_financial': [3, 4, 8, 12, 14, 18],
+        'risk_taking_health_safety': [5, 15, 17, 20, 23, 26],
+        'risk_taking_recreational': [2, 11, 13, 19, 24, 25],
+        'risk_taking_social': [1, 7, 21, 22, 27, 28],
+        'risk_perception_ethical': [36, 39, 40, 46, 59, 60],
+        'risk_perception_financial': [33, 34, 38, 42, 44, 48],
+        'risk_perception_health_safety': [35, 45, 47, 50, 53, 56],
+        'risk_perception_recreational': [32, 41, 43, 49, 54, 55],
+        'risk_perception_social': [31, 37, 51, 52, 57, 58],
+    },
+    'calc_mean': True,
+}
+
+# Subtypes of Antisocial Behavior Questionnaire (STAB) (33-item)
+SCALES['STAB'] = {
+    'n_items': 33,
+    'min': 1,
+    'max': 3,
+    'reversed': [],
+    'subscales': {
+        'phys': [2,5,8,11,14,17,20,23,26,29],
+        'soc': [4,7,10,13,16,19,22,25,28,31,33],
+        'rule': [3,6,9,12,15,18,21,24,27,30,32],
+    },
+    'calc_mean': True,
+}
+
+# Interpersonal Reactivity Index (28-item)
+SCALES['iri'] = {
+    'n_items': 28,
+    'min': 1,
+    'max': 5,
+    'reversed': [3, 4, 7, 12, 13, 14, 15, 18, 19],
+    'subscales': {
+        'perspective_taking': [3, 8, 11, 15, 21, 25, 28],
+        'fantasy': [1, 5, 7, 12, 16, 23, 26],
+        'empathic_concern': [2, 4, 9, 14, 18, 20, 22],
+        'personal_distress': [6, 10, 13, 17, 19, 24, 27],
+    },
+    'calc_mean': False,
+}
+
+# Psychopathic Personality Inventory - Short (56-item)
+SCALES['ppi_short'] = {
+    'n_items': 56,
+    'min': 1,
+    'max': 4,
+    'reversed': [1, 3, 8, 10, 11, 12, 19, 20, 25, 26, 27, 28, 32, 33, 37, 39, 40, 42, 45, 48, 49, 51, 54, 55],
+    'subscales': {
+        'machievellian_egocentricity': [7, 14, 23, 35, 43, 46, 56],
+        'social_influence': [8, 15, 17, 18, 21, 29, 32],
+        'fearlessness': [1, 4, 9, 19, 22, 38, 52],
+        'rebellious_nonconformity': [2, 5, 16, 30, 36, 47, 53],
+        'blame_externalization': [6, 24, 31, 34, 41, 44, 50],
+        'carefree_nonplanfulness': [20, 33, 40, 42, 49, 51, 54],
+        'stress_immunity': [3, 11, 13, 26, 28, 39, 48],
+        'coldheartedness': [10, 12, 25, 27, 37, 45, 55],
+        'selfcentered_impulsivity': [7, 14, 23, 35, 43, 46, 56, 2, 5, 16, 30, 36, 47, 53, 6, 24, 31, 34, 41, 44, 50, 20, 33, 40, 42, 49, 51, 54],
+        'fearless_dominance': [8, 15, 17, 18, 21, 29, 32, 1, 4, 9, 19, 22, 38, 52, 3, 11, 13, 26, 28, 39, 48],
+        'total': list(range(1,56)),
+    },
+    'calc_mean': False,
+}
+
+# Psychopathic Personality Inventory - Long (154-item)
+SCALES['ppi_long'] = {
+    'n_items': 154,
+    'min': 1,
+    'max': 4,
+    'reversed': [3, 5, 6, 9, 10, 17, 21, 22, 24, 27, 28, 30, 31, 38, 44, 47, 50, 51, 53, 59, 65, 68, 69, 71, 72, 73, 74, 75, 76, 79, 82, 83, 86, 87, 88, 89, 97, 98, 99, 100, 101, 106, 108, 109, 110, 113, 117, 119, 120, 121, 123, 124, 128, 129, 130, 133, 135, 141, 142, 143, 145, 146, 152, 153],
+    'subscales': {
+        'machievellian_egocentricity': [1, 11, 17, 23, 33, 39, 45, 55, 61, 67, 77, 83, 92, 103, 114, 125, 132, 136, 147, 154],
+        'social_influence': [2, 21, 22, 24, 34, 41, 43, 46, 56, 63, 65, 68, 78, 85, 87, 91, 113, 135],
+        'fearlessness': [3, 12, 13, 25, 35, 47, 57, 69, 79, 93, 115, 126, 137, 148],
+        'rebellious_nonconformity': [4, 14, 15, 26, 36, 48, 58, 70, 80, 94, 104, 105, 116, 127, 138, 149],
+        'blame_externalization': [16, 18, 19, 38, 40, 60, 62, 82, 84, 90, 100, 112, 122, 134, 144],
+        'carefree_nonplanfulness': [7, 29, 44, 51, 66, 73, 88, 89, 99, 101, 108, 111, 121, 123, 130, 133, 143, 145, 152],
+        'stress_immunity': [6, 10, 28, 32, 50, 54, 72, 76, 96, 118, 119, 140, 141],
+        'deviant_responding': [8, 30, 52, 74, 102, 107, 124, 129, 146, 151],
+        'virtuous_responding': [20, 37, 42, 59, 64, 81, 86, 95, 106, 117, 128, 139, 150],
+        'coldheartedness': [5, 9, 27, 31, 49, 53, 71, 75, 97, 98, 109, 110, 120, 131, 142, 153],
+        'selfcentered_impulsivity': [1, 11, 17, 23, 33, 39, 45, 55, 61, 67, 77, 83, 92, 103, 114, 125, 132, 136, 147, 154] + [4, 14, 15, 26, 36, 48, 58, 70, 80, 94, 104, 105, 116, 127, 138, 149] + [16, 18, 19, 38, 40, 60, 62, 82, 84, 90, 100, 112, 122, 134, 144] + [7, 29, 44, 51, 66, 73, 88, 89, 99, 101, 108, 111, 121, 123, 130, 133, 143, 145, 152],
+        'fearless_dominance': [2, 21, 22, 24, 34, 41, 43, 46, 56, 63, 65, 68, 78, 85, 87, 91, 113, 135] + [3, 12, 13, 25, 35, 47, 57, 69, 79, 93, 115, 126, 137, 148] +[6, 10, 28, 32, 50, 54, 72, 76, 96, 118, 119, 140, 141],
+        'total': list(range(1,154)),
+    },
+    'calc_mean': False,
+}
+
+def register_scale(scale_name, n_items, min, max, subscales, reversed=[], calc_mean=True):
+    """
+    Adds (or replaces) a scale definition in SCALES so it can be scored with
+    survey.score_all()
+    """
+    for subscale_items in subscales.values():
+        assert all(1 <= i <= n_items for i in subscale_items), f"{scale_name} subscale items should be between 1 and {n_items}"
+
+    SCALES[scale_name] = {'n_items': n_items,
+                          'min': min,
+                          'max': max,
+                          'reversed': list(reversed),
+                          'subscales': {k: list(v) for k, v in subscales.items()},
+                          'calc_mean': calc_mean}
+
+def _compile_scales(scales):
+    """
+    Compiles [(registry_name, scale_name), ...] into the item columns to
+    read, their valid min/max responses, reverse-scoring sign and offset
+    vectors (item -> offset + sign * item), an items x subscales
+    weight matrix, the number of items and divisor of each subscale (number
+    of items if averaged, else 1), and the item slice and output column
+    names of each scale.
+    """
+    items, item_min, item_max, sign, offset = [], [], [], [], []
+    rows, cols = [], []
+    n_items, divisor, item_slices, output_cols = [], [], {}, {}
+
+    for registry_name, scale_name in scales:
+        scale = SCALES[registry_name]
+        first_item = len(items)
+        reversed_items = set(scale['reversed'])
+
+        for i in range(1, scale['n_items'] + 1):
+            items.append(f"{scale_name}_{i}")
+            item_min.append(scale['min'])
+            item_max.append(scale['max'])
+            sign.append(-1 if i in reversed_items else 1)
+            offset.append(scale['max'] + scale['min'] if i in reversed_items else 0)
+
+        item_slices[scale_name] = slice(first_item, len(items))
+        output_cols[scale_name] = []
+        for subscale_name, subscale_items in scale['subscales'].items():
+            for i in subscale_items:
+                rows.append(first_item + i - 1)
+                cols.append(len(divisor))
+            n_items.append(len(subscale_items))
+            divisor.append(len(subscale_items) if scale['calc_mean'] else 1)
+            output_cols[scale_name].append(f"{scale_name}_{subscale_name}")
+
+    # dense: at most a few hundred items x a few dozen subscales (and no scipy dependency)
+    weights = np.zeros((len(items), len(divisor)))
+    np.add.at(weights, (rows, cols), 1)
+
+    return {'items': items,
+            'item_min': np.array(item_min, dtype=float),
+            'item_max': np.array(item_max, dtype=float),
+            'sign': np.array(sign, dtype=float),
+            'offset': np.array(offset, dtype=float),
+            'weights': weights,
+            'n_items': np.array(n_items, dtype=float),
+            'divisor': np.array(divisor, dtype=float),
+            'item_slices': item_slices,
+            'output_cols': output_cols}
+
+def _validate_block(items, compiled):
+    """
+    Checks an items array (respondents x compiled['items']) in one pass and
+    returns boolean arrays of missing, out-of-range and non-integer responses
+    """
+    missing = np.isnan(items)
+    with np.errstate(invalid='ignore'):
+        out_of_range = (items < compiled['item_min']) | (items > compiled['item_max'])
+        non_integer = ~missing & (items != np.floor(items))
+    return missing, out_of_range, non_integer
+
+def _scale_usecols(scales, index_col_name, keep_cols=None):
+    """
+    Returns a `usecols` callable for pandas readers that keeps the index
+    column, keep_cols, and the item columns (f"{prefix}_{number}") of scales,
+    a list of registered scale names or a dict of {registered name: prefix}
+    """
+    prefixes = scales.values() if isinstance(scales, dict) else scales
+    item_pattern = re.compile(r"^(?:" + "|".join(re.escape(str(p)) for p in prefixes) + r")_\d+$")
+    keep_cols = set([index_col_name] + list(keep_cols or []))
+    return lambda col: col in keep_cols or item_pattern.match(str(col)) is not None
+
+def _read_columnar(filename, index_col_name, usecols=None):
+    """
+    Reads a .parquet or .feather file, decoding only the columns kept by
+    usecols (see _scale_usecols()), and sets index_col_name as the index
+    """
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    is_parquet = os.path.splitext(filename)[-1] == '.parquet'
+    columns = None
+    if usecols is not None:
+        if is_parquet:
+            names = pyarrow.parquet.read_schema(filename).names
+        else:
+            names = pyarrow.ipc.open_file(filename).schema.names
+        columns = [col for col in names if usecols(col)]
+
+    if is_parquet:
+        data = pd.read_parquet(filename, columns=columns)
+    else:
+        data = pd.read_feather(filename, columns=columns)
+
+    if index_col_name in data.columns:
+        data = data.set_index(index_col_name)
+    return data
+
+def _read_data(filename, index_col_name, xlsx_args=None, usecols=None):
+    """
+    Reads a .csv, .xlsx, .parquet or .feather file with index_col_name as
+    the index, keeping only the columns kept by usecols
+    """
+    if os.path.splitext(filename)[-1] == '.csv':
+        return pd.read_csv(filename, index_col=index_col_name, usecols=usecols)
+    elif os.path.splitext(filename)[-1] == '.xlsx':
+        assert type(xlsx_args)==dict, ("Please specify xlsx_args for pandas.read_excel(): e.g., xlsx_args={\'sheet_name\':\"SHEET\"}")
+        return pd.read_excel(filename, index_col=index_col_name, sheet_name=xlsx_args['sheet_name'], usecols=usecols)
+    elif os.path.splitext(filename)[-1] in ('.parquet', '.feather'):
+        return _read_columnar(filename, index_col_name, usecols)
+    else:
+        raise ValueError("`filename` should be a .csv, .xlsx, .parquet or .feather file")
+
+def _write_data(data, filename, filetype="csv", sep=","):
+    """
+    Writes data to filename + extension as "csv", "excel", "parquet" or
+    "feather" (which stores the index as a column)
+    """
+    if filetype not in ("csv", "excel", "parquet", "feather"):
+        raise ValueError("`filetype` should be one of 'csv', 'excel', 'parquet' or 'feather'")
+
+    with stage('survey.write', key=filename, rows=len(data), columns=data.shape[1]):
+        if filetype == "csv":
+            data.to_csv(filename+".csv", sep=sep)
+        elif filetype == "excel":
+            data.to_excel(filename+".xlsx", sheet_name=filename)
+        elif filetype == "parquet":
+            data.to_parquet(filename+".parquet")
+        else:
+            data.reset_index().to_feather(filename+".feather")
+
+def _hash_key(*parts):
+    # short, stable key for cache entries
+    return hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+
+def _hash_file(filename, block_size=2**20):
+    file_hash = hashlib.blake2b(digest_size=16)
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+def _scale_version(registry_name):
+    # changes whenever the scale definition in SCALES changes
+    return _hash_key(json.dumps(SCALES[registry_name], sort_keys=True))
+
+class _SurveyCache(object):
+    """
+    Directory of pickled DataFrames keyed by content hashes; the least
+    recently used entries are removed once the directory exceeds max_bytes
+    """
+
+    def __init__(self, cache_dir, max_bytes=2**30):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".pkl")
+
+    def load(self, key):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        os.utime(path) # mark as recently used
+        with stage('survey.cache_load', key=key):
+            return pd.read_pickle(path)
+
+    def save(self, key, obj):
+        path = self._path(key)
+        with stage('survey.cache_save', key=key):
+            pd.to_pickle(obj, path + ".tmp", protocol=5)
+            os.replace(path + ".tmp", path)
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".pkl"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            os.remove(path)
+            total_bytes -= size
+
+def score_csv_in_chunks(filename, index_col_name, scales, chunksize=10000, min_answered=None,
+                        output_file=None, sep=","):
+    """
+    Scores a large .csv export `chunksize` rows at a time, reading only the
+    index column and the items of `scales` (see survey.score_all()), so peak
+    memory depends on chunksize rather than file size.
+
+    Scored chunks are appended to output_file (.csv) if given, otherwise
+    concatenated and returned.
+    """
+    reader = pd.read_csv(filename, index_col=index_col_name, chunksize=chunksize,
+                         usecols=_scale_usecols(scales, index_col_name))
+
+    scored_chunks = []
+    for i_chunk, chunk in enumerate(reader):
+        with stage('survey.score_chunk', key=i_chunk, rows=len(chunk), columns=chunk.shape[1]):
+            chunk_survey = survey(chunk, index_col_name)
+            chunk_survey.score_all(scales, min_answered=min_answered)
+            scored_chunk = chunk_survey.join_data(save=False)
+
+        if output_file is None:
+            scored_chunks.append(scored_chunk)
+        else:
+            scored_chunk.to_csv(output_file, sep=sep, mode='w' if i_chunk == 0 else 'a', header=(i_chunk == 0))
+
+    if output_file is None:
+        return pd.concat(scored_chunks)
+
 class survey(object):
 
     """ 
@@ -27,39 +421,131 @@ class survey(object):
 
     """
 
-    def __init__(self,filename,index_col_name,xlsx_args=None):
-        if isinstance(filename, pd.DataFrame):
-            self.data = filename
-        else:
-            if os.path.splitext(filename)[-1] == '.csv':
-                self.data = pd.read_csv(filename, index_col=index_col_name)
-            elif os.path.splitext(filename)[-1] == '.xlsx':
-                assert type(xlsx_args)==dict, ("Please specify xlsx_args for pandas.read_excel(): e.g., xlsx_args={\'sheet_name\':\"SHEET\"}")
-                self.data = pd.read_excel(filename, index_col=index_col_name, sheet_name=xlsx_args['sheet_name'])
-
+    def __init__(self,filename,index_col_name,xlsx_args=None,scales=None,keep_cols=None,compact_items=True,
+                 cache_dir=None,cache_max_bytes=2**30):
+        '''
+        Loads survey data from a DataFrame, .csv, .xlsx, .parquet or .feather
+        file. If scales (list of registered scale names or dict of {registered
+        name: prefix}) is given, only the index column, keep_cols, and the
+        items of those scales are read from file. If compact_items, integer
+        item columns are stored as the smallest nullable integer dtype (see
+        memory_report()).
+
+        If cache_dir is given, the parsed file and each scored scale are cached
+        there, keyed by the file contents, loading options and scale
+        definitions, so unchanged files are not parsed or scored again.
+        '''
         self.original_data = True
         self.index_col_name = index_col_name
         self.scored_data = {}
+        self.item_memory = {}
+
+        self.cache = None if cache_dir is None else _SurveyCache(cache_dir, cache_max_bytes)
+        self.data_key = None
+
+        if self.cache is not None and not isinstance(filename, pd.DataFrame):
+            sheet_name = None if xlsx_args is None else xlsx_args.get('sheet_name')
+            self.data_key = _hash_key(_hash_file(filename), os.path.splitext(filename)[-1], index_col_name,
+                                      sheet_name, scales, keep_cols, compact_items)
+            cached = self.cache.load("data-" + self.data_key)
+            if cached is not None:
+                self.data, self.item_memory = cached
+                return
+
+        source = 'DataFrame' if isinstance(filename, pd.DataFrame) else filename
+        with stage('survey.read', key=source) as read_stage:
+            self._load(filename, index_col_name, xlsx_args, scales, keep_cols)
+            read_stage.set(rows=len(self.data), columns=self.data.shape[1])
+        if compact_items:
+            with stage('survey.compact_items', key=source, rows=len(self.data)):
+                self._compact_items(list(SCALES) if scales is None else scales)
+
+        if self.data_key is not None:
+            self.cache.save("data-" + self.data_key, (self.data, self.item_memory))
+
+    def _load(self, filename, index_col_name, xlsx_args=None, scales=None, keep_cols=None):
+        usecols = None if scales is None else _scale_usecols(scales, index_col_name, keep_cols)
 
-    def select_data(self, sub_ids, rewrite_to_self=False, save=True, filename="selected_data"):
+        if isinstance(filename, pd.DataFrame):
+            self.data = filename
+        else:
+            self.data = _read_data(filename, index_col_name, xlsx_args, usecols)
+
+    def _compact_items(self, scales):
+        ''' downcasts integer-valued item columns of scales to the smallest nullable integer dtype '''
+        is_item = _scale_usecols(scales, None)
+        item_cols = [col for col in self.data.columns if is_item(col)
+                     and pd.api.types.is_numeric_dtype(self.data[col])]
+        if not item_cols:
+            return
+
+        item_df = self.data[item_cols]
+        self.item_memory['before'] = item_df.memory_usage(index=False, deep=True)
+        self.item_memory['dtypes_before'] = item_df.dtypes
+
+        items = item_df.to_numpy(dtype=float, na_value=np.nan)
+        with np.errstate(invalid='ignore'):
+            is_integer = np.all(np.isnan(items) | (items == np.floor(items)), axis=0)
+            col_min = np.nanmin(np.where(np.isnan(items), 0, items), axis=0)
+            col_max = np.nanmax(np.where(np.isnan(items), 0, items), axis=0)
+
+        dtypes = {}
+        for col, integer, lo, hi in zip(item_cols, is_integer, col_min, col_max):
+            if not integer:
+                continue
+            for dtype, info in [('Int8', np.iinfo(np.int8)), ('Int16', np.iinfo(np.int16)), ('Int32', np.iinfo(np.int32))]:
+                if info.min <= lo and hi <= info.max:
+                    dtypes[col] = dtype
+                    break
+
+        if dtypes:
+            self.data = self.data.astype(dtypes)
+        self.item_memory['after'] = self.data[item_cols].memory_usage(index=False, deep=True)
+
+    def memory_report(self):
+        '''
+        Returns a DataFrame with the number of item columns and bytes used by
+        each registered scale's items when loaded (before) and after
+        compacting item dtypes
+        '''
+        if not self.item_memory:
+            raise ValueError("No item columns were compacted! Load data with compact_items=True.")
+
+        report = {}
+        for scale_name in SCALES:
+            is_item = _scale_usecols([scale_name], None)
+            cols = [col for col in self.item_memory['before'].index if is_item(col)]
+            if cols:
+                report[scale_name] = {'n_items': len(cols),
+                                      'bytes_before': self.item_memory['before'][cols].sum(),
+                                      'bytes_after': self.item_memory['after'][cols].sum()}
+
+        return pd.DataFrame.from_dict(report, orient='index')
+
+    def _read_sub_ids(self, sub_ids):
+        ''' returns sub_ids as a list, reading them from file (one per line) if sub_ids is a string '''
         if type(sub_ids) != list:
             if type(sub_ids) != str:
                 raise ValueError("`sub_ids` is not a list or string")
             else:
                 print("\n`sub_ids` is a string, reading "+sub_ids+" from file\n")
                 with open(sub_ids, 'r') as f:
-                    selected_sub_ids = [int(x) for x in f.readlines()]
+                    return [int(x) for x in f.readlines()]
         else:
-            selected_sub_ids = sub_ids 
+            return sub_ids
+
+    def select_data(self, sub_ids, rewrite_to_self=False, save=True, filename="selected_data", filetype="csv"):
+        selected_sub_ids = self._read_sub_ids(sub_ids)
 
         selected_data = self.data.loc[selected_sub_ids, :]
 
         if rewrite_to_self: # if we want to rewrite existing data to score selected data
             self.data = selected_data
             self.original_data = False
+            self.data_key = None # cached scores no longer apply
         else:
             if save:
-                selected_data.to_csv(filename+".csv")
+                _write_data(selected_data, filename, filetype)
             else:
                 return selected_data
 
@@ -67,8 +553,9 @@ class survey(object):
         ''' loads data from indicated scale, sums all subscale items, and takes mean (unless specified otherwise) '''
         item_list = [str(scale_name+"_") + s for s in [str(i) for i in subscale_items]]
         
-        scored_df = pd.DataFrame(index = df.index)
-        scored_df = df.loc[:,item_list].sum(axis=1)
+        with stage('survey.scorer', key=scale_name, rows=len(df), columns=len(item_list)):
+            scored_df = pd.DataFrame(index = df.index)
+            scored_df = df.loc[:,item_list].sum(axis=1)
             
         if calc_mean:
             scored_df = scored_df / len(item_list)
@@ -76,7 +563,8 @@ class survey(object):
         return scored_df
     
     def check_total_items(self, scale_name, scale_total_items):
-        num_items_present = len(self.data.filter(regex=str(scale_name+"_")).columns)
+        with stage('survey.check_items', key=scale_name, columns=self.data.shape[1]):
+            num_items_present = len(self.data.filter(regex=str(scale_name+"_")).columns)
         if num_items_present != scale_total_items:
             raise ValueError(f"Number of question items ({num_items_present}) does not match the number of items specified! Please check your data and try again.")
 
@@ -86,273 +574,300 @@ class survey(object):
         else:
             self.scored_data['other'] = self.data[list]
 
-    def join_data(self, save=True, filename="scored_data", filetype="csv", sep=","):
+    def join_data(self, save=True, filename="scored_data", filetype="csv", sep=",", item_hash=False):
+        '''
+        Joins all scored data and saves it (or returns it, if save=False).
+
+        item_hash=True (or the scales passed to score_incremental(), see
+        item_hashes()) adds an `item_hash` column, so that a later
+        score_incremental() run can detect respondents whose items changed;
+        without it, that run only scores new respondents.
+        '''
         if self.scored_data != {}:
             # loop through all scored data
             all_data = [scored_scale for scored_scale in self.scored_data.values()]
-            joined_data = all_data[0].join(all_data[1:])
+            with stage('survey.join_data', rows=len(all_data[0])) as join_stage:
+                joined_data = all_data[0].join(all_data[1:])
+                join_stage.set(columns=joined_data.shape[1])
+
+            if item_hash is not False:
+                hashes = self.item_hashes(None if item_hash is True else item_hash)
+                joined_data['item_hash'] = hashes.reindex(joined_data.index).to_numpy()
             
             if save:
-                if filetype == "csv":
-                    joined_data.to_csv(filename+".csv", sep=sep) #save to .csv unless otherwise specified
-                elif filetype == "excel":
-                    joined_data.to_excel(filename+".xlsx", sheet_name=filename)
+                _write_data(joined_data, filename, filetype, sep) #save to .csv unless otherwise specified
             else:
                 return joined_data
         else:
             raise ValueError("User needs to score data before trying to join!")               
 
-    def score_hexaco(self, scale_name = 'hexaco'):
-        # initiate variables
-        self.scored_data[scale_name] = pd.DataFrame()
-        
-        # check number of HEXACO total items (columns)
-        self.check_total_items(scale_name, 60)
-        
-        # initiate df with HEXACO items only
-        hexaco = self.data.filter(regex=str(scale_name+"_"))
-        
-        # reverse score items in scale
-        max_scale = 5
-        min_scale = 1
-        reversed_items = [30, 12, 60, 42, 24, 48, 53, 35, 41, 59, 28, 52, 10, 46, 9, 15, 57, 21, 26, 32, 14, 20, 44, 56, 1, 31, 49, 19, 55]
-        
-        for i in reversed_items:
-            hexaco.loc[:,scale_name+"_"+str(i)] = (max_scale + min_scale) - hexaco.loc[:,scale_name+"_"+str(i)] 
-        
-        # specify subscales
-        subscales = {}
-        subscales['honestyhumility'] = [6, 30, 54, 12, 36, 60, 18, 42, 24, 48]
-        subscales['emotionality'] = [5, 29, 53, 11, 35, 17, 41, 23, 47, 59]
-        subscales['extraversion'] = [4, 28, 52, 10, 34, 58, 16, 40, 22, 46]
-        subscales['agreeableness'] = [3, 27, 9, 33, 51, 15, 39, 57, 21, 45]
-        subscales['conscientiousness'] = [2, 26, 8, 32, 14, 38, 50, 20, 44, 56]
-        subscales['openness'] = [1, 25, 7, 31, 13, 37, 49, 19, 43, 55]
-        
-        # score each subscale and store in new dataframe
-        for subscale_name, subscale_items in subscales.items():
-            self.scored_data[scale_name].loc[:,str(scale_name+"_"+subscale_name)] = self.scorer(hexaco, scale_name, subscale_name, subscale_items, calc_mean=True)
-
-    def score_rel_mobility(self, scale_name = 'relational_mobility'):
-        # initiate variables
-        self.scored_data[scale_name] = pd.DataFrame()
-        
-        # check number of Relational Mobility total items (columns)
-        self.check_total_items(scale_name, 12)
-        
-        # initiate df with Relational Mobility items only
-        rel_mobility = self.data.filter(regex=str(scale_name+"_"))
-        
-        # reverse score items in scale
-        max_scale = 6
-        min_scale = 1
-        reversed_items = [4, 5, 7, 9, 11, 12]
-
-        for i in reversed_items:
-            rel_mobility.loc[:,scale_name+"_"+str(i)] = (max_scale + min_scale) - rel_mobility.loc[:,scale_name+"_"+str(i)] 
-        
-        # specify subscales
-        subscales = {}
-        subscales['relational_mobility'] = list(range(1,13))
-        
-        # score each subscale and store in new dataframe
-        for subscale_name, subscale_items in subscales.items():
-            self.scored_data[scale_name].loc[:,str(scale_name+"_"+subscale_name)] = self.scorer(rel_mobility, scale_name, subscale_name, subscale_items, calc_mean=True)
+    def score_cohorts(self, cohorts, scales=None, min_answered=None, save=False, filename="scored_data", filetype="csv", sep=","):
+        '''
+        Scores scales (see score_all()) once for all respondents and splits the
+        joined scores by cohort. cohorts is a dict of {cohort name: list of
+        sub_ids or file with one sub_id per line}.
+
+        Returns a dict of {cohort name: scored DataFrame} (and saves each as
+        f"{filename}_{cohort name}" if save=True). IDs that are not in the data
+        are reported together and stored in self.missing_ids.
+        '''
+        self.score_all(scales, min_answered=min_answered)
+        joined_data = self.join_data(save=False)
+
+        cohort_data = {}
+        self.missing_ids = {}
+        for cohort_name, sub_ids in cohorts.items():
+            sub_ids = pd.Index(self._read_sub_ids(sub_ids))
+            positions = joined_data.index.get_indexer(sub_ids)
+            found = positions >= 0
+
+            if not found.all():
+                self.missing_ids[cohort_name] = list(sub_ids[~found])
+            cohort_data[cohort_name] = joined_data.iloc[positions[found]]
 
-    def score_isel(self, scale_name = 'isel'):
-        # initiate variables
-        self.scored_data[scale_name] = pd.DataFrame()
-
-        # check number of Interpersonal Support Evaluation List (40-item) (columns)
-        self.check_total_items(scale_name, 40)
-        
-        # initiate df with ISEL items only
-        isel = self.data.filter(regex=str(scale_name+"_"))    
-        
-        # reverse score items in scale
-        max_scale = 4
-        min_scale = 0
-        reversed_items = [3, 6, 9, 10, 11, 13, 14, 15, 17, 24, 25, 27, 28, 29, 30, 34, 35, 36, 39, 40]
-
-        for i in reversed_items:
-            isel.loc[:,scale_name+"_"+str(i)] = (max_scale + min_scale) - isel.loc[:,scale_name+"_"+str(i)] 
-
-        # specify subscales
-        subscales = {}
-        subscales['appraisal'] = [1, 6, 11, 17, 19, 22, 26, 30, 36, 38]
-        subscales['tangible'] = [2, 9, 14, 16, 18, 23, 29, 33, 35, 39]
-        subscales['selfesteem'] = [3, 4, 8, 13, 20, 24, 28, 32, 37, 40]
-        subscales['belonging'] = [5, 7, 10, 12, 15, 21, 25, 27, 31, 34]
-
-        # score each subscale and store in new dataframe
-        for subscale_name, subscale_items in subscales.items():
-            self.scored_data[scale_name].loc[:,str(scale_name+"_"+subscale_name)] = self.scorer(isel, scale_name, subscale_name, subscale_items, calc_mean=False)
-
-    def score_dospert(self, scale_name = 'dospert'):
-        # initiate variables
-        self.scored_data[scale_name] = pd.DataFrame()
-
-        # check number of dospert total items (columns) = 60
-        self.check_total_items(scale_name, 60)
-
-        # initiate df with dospert items only
-        dospert = self.data.filter(regex=str(scale_name+"_"))
-
-        # reverse score items in scale
-        max_scale = 7 # scale = 1:7
-        min_scale = 1
-        reversed_items = []
-
-        for i in reversed_items:
-            dospert.loc[:,scale_name+"_"+str(i)] = (max_scale + min_scale) - dospert.loc[:,scale_name+"_"+str(i)]
-
-        # specify subscales
-        subscales = {}
-        subscales['risk_taking_ethical'] = [6, 9, 10, 16, 29, 30]
-        subscales['risk_taking_financial'] = [3, 4, 8, 12, 14, 18]
-        subscales['risk_taking_health_safety'] = [5, 15, 17, 20, 23, 26]
-        subscales['risk_taking_recreational'] = [2, 11, 13, 19, 24, 25]
-        subscales['risk_taking_social'] = [1, 7, 21, 22, 27, 28]
-        subscales['risk_perception_ethical'] = [36, 39, 40, 46, 59, 60]
-        subscales['risk_perception_financial'] = [33, 34, 38, 42, 44, 48]
-        subscales['risk_perception_health_safety'] = [35, 45, 47, 50, 53, 56]
-        subscales['risk_perception_recreational'] = [32, 41, 43, 49, 54, 55]
-        subscales['risk_perception_social'] = [31, 37, 51, 52, 57, 58]
-
-        # score each subscale and store in new dataframe
-        for subscale_name, subscale_items in subscales.items():
-            self.scored_data[scale_name].loc[:,str(scale_name+"_"+subscale_name)] = self.scorer(dospert, scale_name, subscale_name, subscale_items, calc_mean=True)
-
-    def score_stab(self, scale_name = 'STAB'):
-        # initiate variables
-        self.scored_data[scale_name] = pd.DataFrame()
-
-        # check number of items on STAB (columns)
-        self.check_total_items(scale_name, 33)
-        
-        # initiate df with STAB items only
-        STAB = self.data.filter(regex=str(scale_name+"_"))    
-        
-        # reverse score items in scale
-        max_scale = 3
-        min_scale = 1
-        reversed_items = []
-
-        for i in reversed_items:
-            STAB.loc[:,scale_name+"_"+str(i)] = (max_scale + min_scale) - STAB.loc[:,scale_name+"_"+str(i)] 
-        # specify subscales
-        subscales = {}
-        subscales['phys'] = [2,5,8,11,14,17,20,23,26,29]
-        subscales['soc'] = [4,7,10,13,16,19,22,25,28,31,33]
-        subscales['rule'] = [3,6,9,12,15,18,21,24,27,30,32]
-
-        # score each subscale and store in new dataframe
-        for subscale_name, subscale_items in subscales.items():
-            self.scored_data[scale_name].loc[:,str(scale_name+"_"+subscale_name)] = self.scorer(STAB, scale_name, subscale_name, subscale_items, calc_mean=True)
-
-    def score_iri(self, scale_name = 'iri'):
-        # initiate variables
-        self.scored_data[scale_name] = pd.DataFrame()
-
-        # check number of Interpersonal Reactivity Index items (28-item) (columns)
-        self.check_total_items(scale_name, 28)
-        
-        # initiate df with IRI items only
-        iri = self.data.filter(regex=str(scale_name+"_"))    
-        
-        # reverse score items in scale
-        max_scale = 5
-        min_scale = 1
-        reversed_items = [3, 4, 7, 12, 13, 14, 15, 18, 19]
-
-        for i in reversed_items:
-            iri.loc[:,scale_name+"_"+str(i)] = (max_scale + min_scale) - iri.loc[:,scale_name+"_"+str(i)] 
-
-        # specify subscales
-        subscales = {}
-        subscales['perspective_taking'] = [3, 8, 11, 15, 21, 25, 28]
-        subscales['fantasy'] = [1, 5, 7, 12, 16, 23, 26]
-        subscales['empathic_concern'] = [2, 4, 9, 14, 18, 20, 22]
-        subscales['personal_distress'] = [6, 10, 13, 17, 19, 24, 27]
-
-        # score each subscale and store in new dataframe
-        for subscale_name, subscale_items in subscales.items():
-            self.scored_data[scale_name].loc[:,str(scale_name+"_"+subscale_name)] = self.scorer(iri, scale_name, subscale_name, subscale_items, calc_mean=False)
-
-    def score_ppi_short(self, scale_name = 'ppi_short'):
-        # initiate variables
-        self.scored_data[scale_name] = pd.DataFrame()
-
-        # check number of Psychopathic Personality Inventory - Short items (56-item) (columns)
-        self.check_total_items(scale_name, 56)
-        
-        # initiate df with PPI-short items only
-        ppi = self.data.filter(regex=str(scale_name+"_"))
-
-        # reverse score items in scale
-        max_scale = 4
-        min_scale = 1
-        reversed_items = [1, 3, 8, 10, 11, 12, 19, 20, 25, 26, 27, 28, 32, 33, 37, 39, 40, 42, 45, 48, 49, 51, 54, 55]
-
-        for i in reversed_items:
-            ppi.loc[:,scale_name+"_"+str(i)] = (max_scale + min_scale) - ppi.loc[:,scale_name+"_"+str(i)] 
-
-        # specify subscales
-        subscales = {}
-        subscales['machievellian_egocentricity'] = [7, 14, 23, 35, 43, 46, 56]
-        subscales['social_influence'] = [8, 15, 17, 18, 21, 29, 32]
-        subscales['fearlessness'] = [1, 4, 9, 19, 22, 38, 52]
-        subscales['rebellious_nonconformity'] = [2, 5, 16, 30, 36, 47, 53]
-        subscales['blame_externalization'] = [6, 24, 31, 34, 41, 44, 50]
-        subscales['carefree_nonplanfulness'] = [20, 33, 40, 42, 49, 51, 54]
-        subscales['stress_immunity'] = [3, 11, 13, 26, 28, 39, 48]
-
-        subscales['coldheartedness'] = [10, 12, 25, 27, 37, 45, 55]
-        subscales['selfcentered_impulsivity'] = [7, 14, 23, 35, 43, 46, 56, 2, 5, 16, 30, 36, 47, 53, 6, 24, 31, 34, 41, 44, 50, 20, 33, 40, 42, 49, 51, 54]
-        subscales['fearless_dominance'] = [8, 15, 17, 18, 21, 29, 32, 1, 4, 9, 19, 22, 38, 52, 3, 11, 13, 26, 28, 39, 48]
-
-        subscales['total'] = list(range(1,56))
-
-        # score each subscale and store in new dataframe
-        for subscale_name, subscale_items in subscales.items():
-            self.scored_data[scale_name].loc[:,str(scale_name+"_"+subscale_name)] = self.scorer(ppi, scale_name, subscale_name, subscale_items, calc_mean=False)
-
-    def score_ppi_long(self, scale_name = 'ppi_long'):
-        # initiate variables
-        self.scored_data[scale_name] = pd.DataFrame()
-
-        # check number of Psychopathic Personality Inventory - Long items (154-item) (columns)
-        self.check_total_items(scale_name, 154)
-        
-        # initiate df with PPI-short items only
-        ppi = self.data.filter(regex=str(scale_name+"_"))
-
-        # reverse score items in scale
-        max_scale = 4
-        min_scale = 1
-        reversed_items = [3, 5, 6, 9, 10, 17, 21, 22, 24, 27, 28, 30, 31, 38, 44, 47, 50, 51, 53, 59, 65, 68, 69, 71, 72, 73, 74, 75, 76, 79, 82, 83, 86, 87, 88, 89, 97, 98, 99, 100, 101, 106, 108, 109, 110, 113, 117, 119, 120, 121, 123, 124, 128, 129, 130, 133, 135, 141, 142, 143, 145, 146, 152, 153]
-
-        for i in reversed_items:
-            ppi.loc[:,scale_name+"_"+str(i)] = (max_scale + min_scale) - ppi.loc[:,scale_name+"_"+str(i)] 
-
-        # specify subscales
-        subscales = {}
-        subscales['machievellian_egocentricity'] = [1, 11, 17, 23, 33, 39, 45, 55, 61, 67, 77, 83, 92, 103, 114, 125, 132, 136, 147, 154]
-        subscales['social_influence'] = [2, 21, 22, 24, 34, 41, 43, 46, 56, 63, 65, 68, 78, 85, 87, 91, 113, 135]
-        subscales['fearlessness'] = [3, 12, 13, 25, 35, 47, 57, 69, 79, 93, 115, 126, 137, 148]
-        subscales['rebellious_nonconformity'] = [4, 14, 15, 26, 36, 48, 58, 70, 80, 94, 104, 105, 116, 127, 138, 149]
-        subscales['blame_externalization'] = [16, 18, 19, 38, 40, 60, 62, 82, 84, 90, 100, 112, 122, 134, 144] 
-        subscales['carefree_nonplanfulness'] = [7, 29, 44, 51, 66, 73, 88, 89, 99, 101, 108, 111, 121, 123, 130, 133, 143, 145, 152]
-        subscales['stress_immunity'] = [6, 10, 28, 32, 50, 54, 72, 76, 96, 118, 119, 140, 141]
-        subscales['deviant_responding'] = [8, 30, 52, 74, 102, 107, 124, 129, 146, 151]
-        subscales['virtuous_responding'] = [20, 37, 42, 59, 64, 81, 86, 95, 106, 117, 128, 139, 150]
-
-        subscales['coldheartedness'] = [5, 9, 27, 31, 49, 53, 71, 75, 97, 98, 109, 110, 120, 131, 142, 153]
-        subscales['selfcentered_impulsivity'] = [1, 11, 17, 23, 33, 39, 45, 55, 61, 67, 77, 83, 92, 103, 114, 125, 132, 136, 147, 154] + [4, 14, 15, 26, 36, 48, 58, 70, 80, 94, 104, 105, 116, 127, 138, 149] + [16, 18, 19, 38, 40, 60, 62, 82, 84, 90, 100, 112, 122, 134, 144] + [7, 29, 44, 51, 66, 73, 88, 89, 99, 101, 108, 111, 121, 123, 130, 133, 143, 145, 152]
-        subscales['fearless_dominance'] = [2, 21, 22, 24, 34, 41, 43, 46, 56, 63, 65, 68, 78, 85, 87, 91, 113, 135] + [3, 12, 13, 25, 35, 47, 57, 69, 79, 93, 115, 126, 137, 148] +[6, 10, 28, 32, 50, 54, 72, 76, 96, 118, 119, 140, 141]
-
-        subscales['total'] = list(range(1,154))
-
-        # score each subscale and store in new dataframe
-        for subscale_name, subscale_items in subscales.items():
-            self.scored_data[scale_name].loc[:,str(scale_name+"_"+subscale_name)] = self.scorer(ppi, scale_name, subscale_name, subscale_items, calc_mean=False)
+            if save:
+                _write_data(cohort_data[cohort_name], f"{filename}_{cohort_name}", filetype, sep)
+
+        if self.missing_ids:
+            print("\nIDs not found in data: " + "; ".join(f"{cohort_name} ({len(ids)}): {ids}" for cohort_name, ids in self.missing_ids.items()) + "\n")
+
+        return cohort_data
+
+    def item_hashes(self, scales=None):
+        '''
+        returns a hash of each respondent's item values for scales (see
+        score_all()), computed on the numeric values that are scored (see
+        _item_block()), so a respondent's hash does not depend on the dtypes
+        of the item columns (e.g., after another respondent's text response)
+        '''
+        compiled = _compile_scales(list(self._resolve_scales(scales).items()))
+        item_block = self._item_block(compiled)
+        item_block += 0.0 # -0.0 -> 0.0
+        item_block[np.isnan(item_block)] = np.nan # one NaN bit pattern
+        return pd.util.hash_pandas_object(pd.DataFrame(item_block), index=False).set_axis(self.data.index).rename('item_hash')
+
+    def score_incremental(self, previous, scales=None, min_answered=None, save=True,
+                          filename="scored_data", filetype="csv", sep=","):
+        '''
+        Updates previously scored output (a DataFrame or file written by
+        join_data() or score_incremental()) by scoring only respondents that
+        are new, or whose item values changed since the previous output was
+        written (detected using its `item_hash` column, see item_hashes();
+        if previous has no `item_hash` column, e.g. join_data() without
+        item_hash, only new respondents are scored). Other respondents are
+        kept from the previous output as they are.
+
+        Saves (or returns, if save=False) the merged output, including the
+        updated `item_hash` column.
+        '''
+        if not isinstance(previous, pd.DataFrame):
+            previous = _read_data(previous, self.index_col_name)
+
+        scales = self._resolve_scales(scales)
+        hashes = self.item_hashes(scales)
+
+        rescore = ~self.data.index.isin(previous.index)
+        if 'item_hash' in previous.columns:
+            seen = self.data.index[~rescore]
+            changed = previous.loc[seen, 'item_hash'].to_numpy(dtype='uint64') != hashes[~rescore].to_numpy()
+            rescore[~rescore] = changed
+
+        merged = previous.drop(index=self.data.index[rescore], errors='ignore')
+        if rescore.any():
+            new_survey = survey(self.data[rescore], self.index_col_name, compact_items=False)
+            new_survey.item_memory = self.item_memory
+            new_survey.score_all(scales, min_answered=min_answered)
+            merged = pd.concat([merged, new_survey.join_data(save=False)])
+
+        # current hashes, or previous hashes for respondents no longer in the data
+        merged_hashes = np.zeros(len(merged), dtype='uint64')
+        positions = hashes.index.get_indexer(merged.index)
+        found = positions >= 0
+        merged_hashes[found] = hashes.to_numpy()[positions[found]]
+        if 'item_hash' in previous.columns:
+            merged_hashes[~found] = previous.loc[merged.index[~found], 'item_hash'].to_numpy(dtype='uint64')
+        merged['item_hash'] = merged_hashes
+
+        if save:
+            _write_data(merged, filename, filetype, sep)
+        else:
+            return merged
+
+    def _item_block(self, compiled):
+        ''' returns the items in compiled['items'] as one float array (non-numeric responses become NaN) '''
+        item_df = self.data.loc[:, compiled['items']]
+        non_numeric = item_df.select_dtypes(exclude='number').columns
+        if len(non_numeric) > 0:
+            item_df = item_df.copy()
+            item_df[non_numeric] = item_df[non_numeric].apply(pd.to_numeric, errors='coerce')
+        return item_df.to_numpy(dtype=float, na_value=np.nan, copy=True)
+
+    def validate_items(self, scales=None):
+        '''
+        Checks responses to scales from SCALES (default: all registered scales
+        with items in the data) against each scale's min/max and returns a
+        DataFrame with the number of missing, out-of-range and non-integer
+        responses per respondent and scale
+        '''
+        scales = self._resolve_scales(scales)
+        compiled = _compile_scales(list(scales.items()))
+        missing, out_of_range, non_integer = _validate_block(self._item_block(compiled), compiled)
+
+        # count problems within each scale's (contiguous) items
+        starts = [compiled['item_slices'][scale_name].start for scale_name in scales.values()]
+        report = {}
+        for problem, mask in [('n_missing', missing), ('n_out_of_range', out_of_range), ('n_non_integer', non_integer)]:
+            counts = np.add.reduceat(mask, starts, axis=1, dtype=int) if starts else np.empty((len(mask), 0), dtype=int)
+            for i_scale, scale_name in enumerate(scales.values()):
+                report[f"{scale_name}_{problem}"] = counts[:, i_scale]
+
+        return pd.DataFrame(report, index=self.data.index)
+
+    def _score_scales(self, scales, min_answered=None):
+        '''
+        scores [(registry_name, scale_name), ...] in one pass over a single numeric block of items
+
+        If min_answered (proportion of a subscale's items) is given, missing,
+        out-of-range and non-integer responses are excluded and subscale scores
+        are prorated from the remaining items; subscales with fewer valid items
+        than min_answered are NaN
+        '''
+        if self.cache is None or self.data_key is None:
+            self._compute_scales(scales, min_answered)
+            return
+
+        keys = {scale_name: "scored-" + _hash_key(self.data_key, registry_name, scale_name,
+                                                 _scale_version(registry_name), min_answered)
+                for registry_name, scale_name in scales}
+
+        uncached = []
+        for registry_name, scale_name in scales:
+            cached = self.cache.load(keys[scale_name])
+            if cached is None:
+                uncached.append((registry_name, scale_name))
+            else:
+                self.scored_data[scale_name] = cached
+
+        if uncached:
+            self._compute_scales(uncached, min_answered)
+            for registry_name, scale_name in uncached:
+                self.cache.save(keys[scale_name], self.scored_data[scale_name])
+
+    def _compute_scales(self, scales, min_answered=None):
+        ''' scores scales without the cache (see _score_scales()) '''
+        compiled = _compile_scales(scales)
+        scale_names = ','.join(scale_name for _, scale_name in scales)
+        with stage('survey.item_block', key=scale_names, rows=len(self.data), columns=len(compiled['items'])):
+            items = self._item_block(compiled)
+
+        with stage('survey.score', key=scale_names, rows=len(self.data), columns=len(compiled['items'])):
+            if min_answered is None:
+                # reverse score items, then sum items into subscales (missing items count as 0, as in scorer)
+                items *= compiled['sign']
+                items += compiled['offset']
+                is_missing = np.isnan(items)
+                missing = {scale_name: is_missing[:, item_slice].any() for scale_name, item_slice in compiled['item_slices'].items()}
+                items[is_missing] = 0
+                scores = items @ compiled['weights'] / compiled['divisor']
+            else:
+                assert 0 < min_answered <= 1, "min_answered should be a proportion of items between 0 and 1"
+                valid = ~np.logical_or.reduce(_validate_block(items, compiled))
+                items *= compiled['sign']
+                items += compiled['offset']
+                items[~valid] = 0
+
+                # mean of answered items, scaled back up to the number of items for summed subscales
+                n_answered = valid.astype(float) @ compiled['weights']
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    scores = items @ compiled['weights'] / n_answered
+                scores *= compiled['n_items'] / compiled['divisor']
+                scores[n_answered < min_answered * compiled['n_items']] = np.nan
+
+        # store each scale in new dataframe
+        first_col = 0
+        for registry_name, scale_name in scales:
+            with stage('survey.store_scale', key=scale_name, rows=len(self.data),
+                       columns=len(compiled['output_cols'][scale_name])):
+                output_cols = compiled['output_cols'][scale_name]
+                scored_df = pd.DataFrame(scores[:, first_col:first_col + len(output_cols)],
+                                         index=self.data.index, columns=output_cols)
+                first_col += len(output_cols)
+
+                # summed integer responses stay integers (unless responses are missing)
+                item_cols = compiled['items'][compiled['item_slices'][scale_name]]
+                item_dtypes = self.data.dtypes[item_cols]
+                if 'dtypes_before' in self.item_memory:
+                    # judge compacted items by their dtypes as loaded
+                    loaded_dtypes = self.item_memory['dtypes_before']
+                    item_dtypes = [loaded_dtypes.get(col, dtype) for col, dtype in item_dtypes.items()]
+                if (min_answered is None and not SCALES[registry_name]['calc_mean'] and not missing[scale_name]
+                        and all(pd.api.types.is_integer_dtype(d) for d in item_dtypes)):
+                    scored_df = scored_df.astype('int64')
+
+                self.scored_data[scale_name] = scored_df
+
+    def _resolve_scales(self, scales):
+        ''' returns {registered name: column prefix} for scales, checking that each is registered and complete '''
+        if scales is None:
+            scales = [name for name in SCALES if len(self.data.filter(regex=str(name+"_")).columns) > 0]
+        if not isinstance(scales, dict):
+            scales = {name: name for name in scales}
+
+        for registry_name, scale_name in scales.items():
+            if registry_name not in SCALES:
+                raise ValueError(f"{registry_name} is not a registered scale! Available scales: {list(SCALES)}")
+            self.check_total_items(scale_name, SCALES[registry_name]['n_items'])
+
+        return scales
+
+    def score_all(self, scales=None, min_answered=None):
+        '''
+        Scores scales from SCALES in one vectorized pass. `scales` can be a
+        list of registered scale names or a dict of {registered name: column
+        prefix in the data}; by default, every registered scale with items
+        in the data is scored. See _score_scales() for min_answered.
+        '''
+        scales = self._resolve_scales(scales)
+
+        if scales:
+            self._score_scales(list(scales.items()), min_answered=min_answered)
+
+    def score_hexaco(self, scale_name = 'hexaco', min_answered=None):
+        # score HEXACO Personality Inventory (60-item) (see SCALES['hexaco'])
+        self.check_total_items(scale_name, SCALES['hexaco']['n_items'])
+        self._score_scales([('hexaco', scale_name)], min_answered=min_answered)
+
+    def score_rel_mobility(self, scale_name = 'relational_mobility', min_answered=None):
+        # score Relational Mobility Scale (12-item) (see SCALES['relational_mobility'])
+        self.check_total_items(scale_name, SCALES['relational_mobility']['n_items'])
+        self._score_scales([('relational_mobility', scale_name)], min_answered=min_answered)
+
+    def score_isel(self, scale_name = 'isel', min_answered=None):
+        # score Interpersonal Support Evaluation List (40-item) (see SCALES['isel'])
+        self.check_total_items(scale_name, SCALES['isel']['n_items'])
+        self._score_scales([('isel', scale_name)], min_answered=min_answered)
+
+    def score_dospert(self, scale_name = 'dospert', min_answered=None):
+        # score Domain-Specific Risk-Taking (DOSPERT) Scale (60-item) (see SCALES['dospert'])
+        self.check_total_items(scale_name, SCALES['dospert']['n_items'])
+        self._score_scales([('dospert', scale_name)], min_answered=min_answered)
+
+    def score_stab(self, scale_name = 'STAB', min_answered=None):
+        # score Subtypes of Antisocial Behavior Questionnaire (33-item) (see SCALES['STAB'])
+        self.check_total_items(scale_name, SCALES['STAB']['n_items'])
+        self._score_scales([('STAB', scale_name)], min_answered=min_answered)
+
+    def score_iri(self, scale_name = 'iri', min_answered=None):
+        # score Interpersonal Reactivity Index (28-item) (see SCALES['iri'])
+        self.check_total_items(scale_name, SCALES['iri']['n_items'])
+        self._score_scales([('iri', scale_name)], min_answered=min_answered)
+
+    def score_ppi_short(self, scale_name = 'ppi_short', min_answered=None):
+        # score Psychopathic Personality Inventory - Short (56-item) (see SCALES['ppi_short'])
+        self.check_total_items(scale_name, SCALES['ppi_short']['n_items'])
+        self._score_scales([('ppi_short', scale_name)], min_answered=min_answered)
+
+    def score_ppi_long(self, scale_name = 'ppi_long', min_answered=None):
+        # score Psychopathic Personality Inventory - Long (154-item) (see SCALES['ppi_long'])
+        self.check_total_items(scale_name, SCALES['ppi_long']['n_items'])
+        self._score_scales([('ppi_long', scale_name)], min_answered=min_answered)
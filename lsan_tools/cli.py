@@ -0,0 +1,91 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+
+__all__ = ['score_surveys']
+
+__author__ = ["Shawn Rhoads"]
+
+def _score_file(filename, index_col_name, scales, sheet_name=None, min_answered=None):
+    # scores one survey file; errors (e.g., from check_total_items) are reported in the status
+    import pandas as pd
+    from .behav import survey
+
+    status = {'file': filename, 'status': 'ok', 'n_respondents': 0, 'error': '', 'seconds': 0.0}
+    start = time.perf_counter()
+    try:
+        xlsx_args = None if sheet_name is None else {'sheet_name': sheet_name}
+        file_survey = survey(filename, index_col_name, xlsx_args=xlsx_args, scales=scales)
+        file_survey.score_all(scales, min_answered=min_answered)
+        scored_data = file_survey.join_data(save=False)
+        scored_data.insert(0, 'source_file', os.path.basename(filename))
+        status['n_respondents'] = len(scored_data)
+    except Exception as error:
+        scored_data = pd.DataFrame()
+        status['status'] = 'failed'
+        status['error'] = f"{type(error).__name__}: {error}"
+    status['seconds'] = round(time.perf_counter() - start, 3)
+
+    return status, scored_data
+
+def score_surveys(patterns, index_col_name, output_dir, scales=None, sheet_name=None, min_answered=None,
+                  n_jobs=1, filename="scored_surveys", filetype="csv"):
+    """
+    Scores every survey file matching the glob patterns across `n_jobs`
+    processes and writes one combined output (with a `source_file` column)
+    plus manifest.csv with the status of each file to output_dir. Files that
+    fail (e.g., check_total_items) are reported in the manifest without
+    stopping the batch.
+
+    Returns the manifest as a DataFrame.
+    """
+    import pandas as pd
+    from .behav import _write_data
+
+    files = sorted(set(f for pattern in patterns for f in glob(pattern)))
+    if not files:
+        raise ValueError(f"No files match {patterns}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    args = [(f, index_col_name, scales, sheet_name, min_answered) for f in files]
+    if n_jobs == 1:
+        results = [_score_file(*file_args) for file_args in args]
+    else:
+        n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            results = list(pool.map(_score_file, *zip(*args)))
+
+    manifest = pd.DataFrame([status for status, _ in results])
+    manifest.to_csv(os.path.join(output_dir, "manifest.csv"), index=False)
+
+    scored_data = [data for status, data in results if status['status'] == 'ok']
+    if scored_data:
+        _write_data(pd.concat(scored_data), os.path.join(output_dir, filename), filetype)
+
+    return manifest
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score many survey files with lsan_tools.behav.survey")
+    parser.add_argument('patterns', nargs='+', help="survey files or glob patterns (quote to avoid shell expansion)")
+    parser.add_argument('-i', '--index-col', required=True, help="name of the subject ID column")
+    parser.add_argument('-o', '--output-dir', required=True, help="directory for combined output and manifest.csv")
+    parser.add_argument('-s', '--scales', nargs='+', default=None, help="registered scales to score (default: all present)")
+    parser.add_argument('--sheet-name', default=None, help="sheet name for .xlsx files")
+    parser.add_argument('--min-answered', type=float, default=None, help="prorate subscales with at least this proportion of valid items")
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="number of processes (-1 for all CPUs)")
+    parser.add_argument('--filename', default="scored_surveys", help="name of combined output file (without extension)")
+    parser.add_argument('--filetype', default="csv", choices=['csv', 'excel', 'parquet', 'feather'])
+    args = parser.parse_args(argv)
+
+    manifest = score_surveys(args.patterns, args.index_col, args.output_dir, scales=args.scales,
+                             sheet_name=args.sheet_name, min_answered=args.min_answered, n_jobs=args.jobs,
+                             filename=args.filename, filetype=args.filetype)
+
+    n_failed = (manifest['status'] == 'failed').sum()
+    print(f"Scored {len(manifest) - n_failed}/{len(manifest)} files; see {os.path.join(args.output_dir, 'manifest.csv')}")
+    return 1 if n_failed else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,20 +1,219 @@
-from bids.layout import BIDSLayout
 import pandas as pd
 import numpy as np
+import hashlib
+import json
 import os
+import re
+from math import lgamma
 
-__all__ = ['get_timing','bunch_timing' ]
+from ..instrument import stage
+
+__all__ = ['get_timing','get_events_table','gen_DesignMat','spm_hrf','bunch_timing' ]
 __author__ = ["Shawn Rhoads"]
 
+def _tree_fingerprint(base_dir, skip_dirs=()):
+    '''
+    Hash of the modification times of every directory under base_dir
+    (excluding derivatives and skip_dirs), which change when files are
+    added, removed or renamed
+    '''
+    skip_dirs = set(os.path.abspath(d) for d in skip_dirs) | {os.path.abspath(os.path.join(base_dir, 'derivatives'))}
+    fingerprint = hashlib.blake2b(digest_size=16)
+
+    for dirpath, dirnames, _ in os.walk(base_dir):
+        dirnames[:] = sorted(d for d in dirnames if os.path.abspath(os.path.join(dirpath, d)) not in skip_dirs)
+        fingerprint.update(f"{os.path.relpath(dirpath, base_dir)}:{os.stat(dirpath).st_mtime_ns};".encode())
+
+    return fingerprint.hexdigest()
+
+# pybids' default ignored locations (relative to base_dir), plus derivatives
+DEFAULT_LAYOUT_IGNORE = ['code', 'models', 'sourcedata', 'stimuli', 'derivatives']
+
+def _load_layout(base_dir, task_id, database_path=None, events_only=False, verbose=True):
+    '''
+    Returns a BIDSLayout of base_dir. If database_path is given, the index is
+    saved there on first use and reused as long as the directory tree is
+    unchanged (see _tree_fingerprint()). If events_only, only the
+    *_events.tsv files of task_id are indexed.
+    '''
+    from bids.layout import BIDSLayout, BIDSLayoutIndexer
+
+    indexer_kwargs = {}
+    if events_only:
+        # ignore every file except task events (directories have no extension and are still walked);
+        # a custom ignore list replaces pybids' defaults, so DEFAULT_LAYOUT_IGNORE repeats them
+        not_events = rf"^(?!.*task-{re.escape(task_id)}_.*events\.tsv$)(?!.*dataset_description\.json$).*/[^/]+\.[^/]+$"
+        indexer_kwargs['indexer'] = BIDSLayoutIndexer(ignore=DEFAULT_LAYOUT_IGNORE + [re.compile(not_events)])
+
+    if database_path is None:
+        with stage('events.layout', key=base_dir):
+            return BIDSLayout(base_dir, **indexer_kwargs)
+
+    fingerprint = {'tree': _tree_fingerprint(base_dir, skip_dirs=[database_path]),
+                   'task_id': task_id if events_only else None,
+                   'events_only': events_only,
+                   'ignore': DEFAULT_LAYOUT_IGNORE if events_only else None}
+    fingerprint_file = os.path.join(database_path, 'lsan_fingerprint.json')
+
+    reset_database = True
+    if os.path.exists(fingerprint_file):
+        with open(fingerprint_file, 'r') as f:
+            reset_database = json.load(f) != fingerprint
+
+    if verbose:
+        print(f"{'Indexing' if reset_database else 'Reusing index of'} {base_dir} ({database_path})")
+
+    with stage('events.layout', key=base_dir):
+        layout = BIDSLayout(base_dir, database_path=database_path, reset_database=reset_database, **indexer_kwargs)
+
+    if reset_database:
+        with open(fingerprint_file, 'w') as f:
+            json.dump(fingerprint, f)
+
+    return layout
+
+def _subject_events(sub_identifier, event_files, trial_type_cols=[], trimTRby=0, sort_df_by=None):
+    '''
+    Reads one subject's {run: events.tsv} files into a long table with one
+    row per event and trial type column: subject, run, column, condition,
+    onset (minus trimTRby) and duration. Within each run and column, rows
+    are ordered by condition (sorted), then by their order in the file.
+    '''
+    run_tables = []
+
+    for run_identifier, event_file in event_files.items():
+        # get df of events information
+        with stage('events.read_tsv', key=f"{sub_identifier}/{run_identifier}") as read_stage:
+            __trialInfo__ = pd.read_table(event_file)
+            read_stage.set(rows=len(__trialInfo__), columns=__trialInfo__.shape[1])
+
+        if sort_df_by is not None:
+            __trialInfo__ = __trialInfo__.sort_values(by=[sort_df_by])
+
+        if trial_type_cols == []: #if no columns for trial_types specified
+            columns = __trialInfo__.columns[2:]
+        else:
+            for t1 in trial_type_cols:
+                assert any(t1==t2 for t2 in __trialInfo__.columns), f"{t1} info is not in *events.tsv"
+            columns = trial_type_cols
+
+        for column in columns:
+            column_table = pd.DataFrame({'subject': sub_identifier,
+                                         'run': run_identifier,
+                                         'column': column,
+                                         'condition': __trialInfo__[column].to_numpy(),
+                                         'onset': __trialInfo__['onset'].to_numpy() - trimTRby, # subtracting trimTRby due to remove dummy scans
+                                         'duration': __trialInfo__['duration'].to_numpy()})
+            run_tables.append(column_table.sort_values('condition', kind='stable'))
+
+    if not run_tables:
+        return pd.DataFrame(columns=['subject', 'run', 'column', 'condition', 'onset', 'duration'])
+    return pd.concat(run_tables, ignore_index=True)
+
+def _events_dict_from_table(events_table):
+    '''
+    Converts a long events table into {subject: {'onsets': {column: {condition:
+    {run: [...]}}}, 'durations': {...}}} with one groupby per column
+
+    Events files without a run entity have run None, which is NaN in the
+    categorical run column; those groups are kept (dropna=False) and mapped
+    back to None. Events with a missing condition are skipped.
+    '''
+    events_dict = {}
+
+    for column, column_table in events_table.groupby('column', sort=False, observed=True):
+        column_table = column_table[column_table['condition'].notna()]
+        grouped = column_table.groupby(['subject', 'condition', 'run'], sort=False, observed=True,
+                                       dropna=False)[['onset', 'duration']].agg(list)
+
+        for (sub_identifier, condition, run_identifier), (run_onsets, run_durs) in zip(grouped.index, grouped.to_numpy()):
+            run_identifier = None if pd.isna(run_identifier) else run_identifier
+            sub_dict = events_dict.setdefault(sub_identifier, {'onsets': {}, 'durations': {}})
+            sub_dict['onsets'].setdefault(column, {}).setdefault(condition, {})[run_identifier] = run_onsets
+            sub_dict['durations'].setdefault(column, {}).setdefault(condition, {})[run_identifier] = run_durs
+
+    return events_dict
+
+def _write_timing(sub_identifier, onsets, durations, task_id, onsets_only=False, output_dir=None, base_dir=None):
+    '''
+    Writes one .txt file per column and condition with one line per run:
+    ONSET:DURATION pairs, or onsets if onsets_only (get_timing() with
+    trial_type_cols). Returns the written files.
+    '''
+    written_files = []
+
+    with stage('events.write_timing', key=sub_identifier) as write_stage:
+        for column in onsets.keys():
+            if column == 'response_time': #cannot handle response_times yet
+                continue
+
+            if output_dir is None:
+                writeToPath = os.path.join(base_dir,'derivatives','timing',f'sub-{sub_identifier}',column)
+            else:
+                writeToPath = os.path.join(output_dir,f'sub-{sub_identifier}',column)
+
+            if not os.path.exists(writeToPath):
+                os.makedirs(writeToPath, exist_ok=True)
+
+            for (onset_key, onset_val), (dur_key, dur_val) in zip(onsets[column].items(), durations[column].items()):
+                assert (onset_key==dur_key), "onset conditions and duration conditions do not match!"
+
+                # format the whole file first, then write it at once
+                lines = []
+                for (run_onsets, run_durs) in zip(onset_val.values(), dur_val.values()):
+
+                    if onsets_only:
+                        lines.append("".join(f"{onset_time:.1f}\t" for (onset_time, dur_time) in zip(run_onsets, run_durs)))
+                    else:
+                        lines.append("".join("%f:%f\t" % (onset_time, dur_time) for (onset_time, dur_time) in zip(run_onsets, run_durs)))
+
+                timing_file = f'{writeToPath}/sub-{sub_identifier}_task-{task_id}_timing-{onset_key}.txt'
+                with open(timing_file, 'w') as filehandle:
+                    filehandle.write("".join(line + "\n" for line in lines))
+                written_files.append(timing_file)
+
+        write_stage.set(rows=len(written_files))
+
+    return written_files
+
+def _timing_hash(event_files, **params):
+    # hash of a subject's events files and the parameters used to write its timing files
+    timing_hash = hashlib.blake2b(repr(sorted(params.items())).encode(), digest_size=16)
+    for run_identifier, event_file in event_files.items():
+        timing_hash.update(repr(run_identifier).encode())
+        with open(event_file, 'rb') as f:
+            timing_hash.update(f.read())
+    return timing_hash.hexdigest()
+
+def spm_hrf(TR, oversampling=16, time_length=32.):
+    '''
+    SPM canonical (double gamma) HRF sampled every TR/oversampling secs for
+    time_length secs, scaled to sum to 1
+    '''
+    dt = TR / oversampling
+    t = np.arange(0, time_length, dt)
+
+    def gamma_pdf(t, shape):
+        with np.errstate(divide='ignore'):
+            return np.exp((shape - 1) * np.log(t) - t - lgamma(shape))
+
+    hrf = gamma_pdf(t, 6) - gamma_pdf(t, 16) / 6
+    return hrf / hrf.sum()
+
 class events_class(object):
 
-    def __init__(self, base_dir, task_id, sub_ids=None, verbose=True):
+    def __init__(self, base_dir, task_id, sub_ids=None, verbose=True, database_path=None, events_only=False):
+        '''
+        Indexes BIDS-formatted base_dir for task_id. If database_path is given,
+        the BIDS index is stored there and reused until files are added to or
+        removed from base_dir; events_only=True only indexes *_events.tsv
+        files of task_id.
+        '''
         assert type(base_dir) == str, "base_dir should be type(str)"
         assert type(task_id) == str, "task_id should be type(str)"
 
-
         self.base_dir = base_dir
-        self.layout = BIDSLayout(base_dir)
+        self.layout = _load_layout(base_dir, task_id, database_path, events_only, verbose)
         self.task_id = task_id
 
         if sub_ids == None:
@@ -30,144 +229,220 @@ class events_class(object):
         if verbose:
             print(f'{len(self.sub_ids)} subjects in {self.task_id} task')
 
-    def get_timing(self, trial_type_cols=[], trimTRby=0, software='AFNI', sort_df_by=None, write=True, output_dir=None):
-        '''
-        Throws timing information for each subject into dictionary
-        '''
-        assert (software == 'AFNI' or software == 'SPM'), "software should be AFNI or SPM"
+    def _event_files(self):
+        ''' returns {sub_id: {run: events.tsv path}} for all subjects, from one layout query '''
+        event_files = {sub_identifier: {} for sub_identifier in self.sub_ids}
 
-        self.events_dict = {}
+        with stage('events.layout_get', key=self.task_id) as get_stage:
+            layout_files = self.layout.get(suffix='events', task=self.task_id, extension='tsv',
+                                           subject=self.sub_ids, return_type='object')
+            for event_file in layout_files:
+                entities = event_file.get_entities()
+                event_files[entities['subject']][entities.get('run')] = event_file.path
+            get_stage.set(rows=len(layout_files))
 
-        self.events_dict[self.task_id] = {}
+        # order runs within each subject
+        return {sub_identifier: dict(sorted(runs.items(), key=lambda run: (run[0] is None, run[0] or 0)))
+                for sub_identifier, runs in event_files.items()}
 
-        for sub_identifier in self.sub_ids:
-            
-            self.events_dict[self.task_id][sub_identifier] = {}
-
-            run_ids = self.layout.get_runs(subject=sub_identifier, task=self.task_id)
-            
-            run_identifier = None
-            for run_identifier in run_ids:
-                __eventFile__ = self.layout.get(suffix='events',
-                                                 task=self.task_id,
-                                                  run=run_identifier,
-                                                  extension='tsv',
-                                                  return_type='file')
-                
-                # get df of events information
-                __trialInfo__ = pd.read_table(__eventFile__[0])
-                
-                if sort_df_by is not None:
-                    __trialInfo__ = __trialInfo__.sort_values(by=[sort_df_by])
-                
-                if run_identifier == 1:
-                    onsets = {}
-                    durations = {}
-
-                if trial_type_cols == []: #if no columns for trial_types specified
-
-                    for column in __trialInfo__.columns[2:]:
-
-                        __conditions__ = sorted(list(set(__trialInfo__[column])))
-
-                        # extracting onset and duration information for task, subject, run, trial_type
-                        if run_identifier == 1:
-                            onsets[column] = {}
-                            durations[column] = {}
-
-                        for itrial in __conditions__:
-                            if run_identifier == 1:
-                                onsets[column][itrial] = {}
-                                durations[column][itrial] = {}
-                            try:
-                                onsets[column][itrial][run_identifier] = (list(__trialInfo__[__trialInfo__[column]==itrial].onset-trimTRby)) # subtracting trimTRby due to remove dummy scans
-                                durations[column][itrial][run_identifier] = (list(__trialInfo__[__trialInfo__[column]==itrial].duration))
-                            except KeyError:
-                                onsets[column][itrial] = {}
-                                durations[column][itrial] = {}
-
-                                onsets[column][itrial][run_identifier] = (list(__trialInfo__[__trialInfo__[column]==itrial].onset-trimTRby)) # subtracting trimTRby due to remove dummy scans
-                                durations[column][itrial][run_identifier] = (list(__trialInfo__[__trialInfo__[column]==itrial].duration))
-                else:
-                    for t1 in trial_type_cols:
-                        assert any(t1==t2 for t2 in __trialInfo__.columns), f"{t1} info is not in *events.tsv"
-
-                    for column in trial_type_cols:
-
-                        __conditions__ = sorted(list(set(__trialInfo__[column])))
-
-                        # extracting onset and duration information for task, subject, run, trial_type
-                        if run_identifier == 1:
-                            onsets[column] = {}
-                            durations[column] = {}
-
-                        for itrial in __conditions__:
-                            if run_identifier == 1:
-                                onsets[column][itrial] = {}
-                                durations[column][itrial] = {}
-
-                            try:
-                                onsets[column][itrial][run_identifier] = (list(__trialInfo__[__trialInfo__[column]==itrial].onset-trimTRby)) # subtracting trimTRby due to remove dummy scans
-                                durations[column][itrial][run_identifier] = (list(__trialInfo__[__trialInfo__[column]==itrial].duration))
-                            except KeyError:
-                                onsets[column][itrial] = {}
-                                durations[column][itrial] = {}
-
-                                onsets[column][itrial][run_identifier] = (list(__trialInfo__[__trialInfo__[column]==itrial].onset-trimTRby)) # subtracting trimTRby due to remove dummy scans
-                                durations[column][itrial][run_identifier] = (list(__trialInfo__[__trialInfo__[column]==itrial].duration))
-            
-            self.events_dict[self.task_id][sub_identifier]['onsets'] = onsets
-            self.events_dict[self.task_id][sub_identifier]['durations'] = durations
-
-            if write == True:
-
-                if trial_type_cols == []: #if no columns for trial_types specified
-
-                    for column in __trialInfo__.columns[2:]:
-                        if column == 'response_time': #cannot handle response_times yet
-                            continue
-
-                        if output_dir is None:
-                            writeToPath = os.path.join(self.base_dir,'derivatives','timing',f'sub-{sub_identifier}',column)
-                        else:
-                            writeToPath = os.path.join(output_dir,f'sub-{sub_identifier}',column)
-
-                        if not os.path.exists(writeToPath):
-                            os.makedirs(writeToPath)
-
-                        for (onset_key, onset_val), (dur_key, dur_val) in zip(onsets[column].items(), durations[column].items()):
-                            assert (onset_key==dur_key), "onset conditions and duration conditions do not match!"
-
-                            with open(f'{writeToPath}/sub-{sub_identifier}_task-{self.task_id}_timing-{onset_key}.txt', 'w') as filehandle:
-
-                                for (run_onsets, run_durs) in zip(onset_val.values(), dur_val.values()):
-
-
-                                    filehandle.writelines("%f:%f\t" % (onset_time, dur_time) for (onset_time, dur_time) in zip(run_onsets, run_durs))
-                                    filehandle.write("\n")
-                else:
-
-                    for column in trial_type_cols:
-                        if column == 'response_time': #cannot handle response_times yet
-                            continue
+    def _map_subjects(self, function, args, n_jobs=1, parallel='process'):
+        ''' applies function to each tuple in args, in n_jobs processes or threads, keeping order '''
+        assert parallel in ('process', 'thread'), "parallel should be 'process' or 'thread'"
+
+        if n_jobs == 1:
+            return [function(*function_args) for function_args in args]
+
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-                        if output_dir is None:
-                            writeToPath = os.path.join(self.base_dir,'derivatives','timing',f'sub-{sub_identifier}',column)
-                        else:
-                            writeToPath = os.path.join(output_dir,f'sub-{sub_identifier}',column)
+        n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+        executor = ProcessPoolExecutor if parallel == 'process' else ThreadPoolExecutor
+        with executor(max_workers=n_jobs) as pool:
+            return list(pool.map(function, *zip(*args)))
 
-                        if not os.path.exists(writeToPath):
-                            os.makedirs(writeToPath)
+    def get_events_table(self, trial_type_cols=[], trimTRby=0, sort_df_by=None, n_jobs=1, parallel='process'):
+        '''
+        Loads all subjects' and runs' *events.tsv files into one long DataFrame
+        (self.events_table) with categorical subject, run, column and condition
+        keys and one row per event and trial type column (default: all columns
+        after 'onset' and 'duration')
+
+        Subjects can be read in parallel with n_jobs (-1 for all CPUs)
+        processes (parallel='process') or threads (parallel='thread').
+        '''
+        event_files = self._event_files()
+        args = [(sub_identifier, event_files[sub_identifier], trial_type_cols, trimTRby, sort_df_by)
+                for sub_identifier in self.sub_ids]
+        with stage('events.read_events', key=self.task_id) as read_stage:
+            subject_tables = self._map_subjects(_subject_events, args, n_jobs, parallel)
+            read_stage.set(rows=sum(len(table) for table in subject_tables), columns=len(args))
+        self.event_files = event_files
+
+        events_table = pd.concat(subject_tables, ignore_index=True)
+        events_table['subject'] = pd.Categorical(events_table['subject'], categories=self.sub_ids)
+        for key in ['run', 'column', 'condition']:
+            events_table[key] = events_table[key].astype('category')
+
+        self.events_table = events_table
+        return events_table
+
+    def get_timing(self, trial_type_cols=[], trimTRby=0, software='AFNI', sort_df_by=None, write=True, output_dir=None,
+                   n_jobs=1, parallel='process', incremental=False, timing_table=False):
+        '''
+        Throws timing information for each subject into dictionary (built
+        from get_events_table())
+
+        Subjects can be processed in parallel with n_jobs (-1 for all CPUs)
+        processes (parallel='process') or threads (parallel='thread'); output
+        is the same for any n_jobs.
+
+        If incremental, timing files are only re-written for subjects whose
+        events files or parameters changed since the last write (tracked in
+        timing_manifest.json in the output folder). If timing_table, all
+        events are also written to one task-{task_id}_timing.tsv table.
+        '''
+        assert (software == 'AFNI' or software == 'SPM'), "software should be AFNI or SPM"
 
-                        for (onset_key, onset_val), (dur_key, dur_val) in zip(onsets[column].items(), durations[column].items()):
-                            assert (onset_key==dur_key), "onset conditions and duration conditions do not match!"
+        events_table = self.get_events_table(trial_type_cols, trimTRby, sort_df_by, n_jobs, parallel)
+        with stage('events.events_dict', key=self.task_id, rows=len(events_table)):
+            subject_events = _events_dict_from_table(events_table)
 
-                            with open(f'{writeToPath}/sub-{sub_identifier}_task-{self.task_id}_timing-{onset_key}.txt', 'w') as filehandle:
+        self.events_dict = {}
 
-                                for (run_onsets, run_durs) in zip(onset_val.values(), dur_val.values()):
+        self.events_dict[self.task_id] = {}
 
-                                    filehandle.writelines(f"{onset_time:.1f}\t" for (onset_time, dur_time) in zip(run_onsets, run_durs))
-                                    filehandle.write("\n")
+        for sub_identifier in self.sub_ids:
+            self.events_dict[self.task_id][sub_identifier] = subject_events.get(sub_identifier, {'onsets': {}, 'durations': {}})
+
+        if write == True:
+            timing_dir = os.path.join(self.base_dir,'derivatives','timing') if output_dir is None else output_dir
+            os.makedirs(timing_dir, exist_ok=True)
+            manifest_file = os.path.join(timing_dir, 'timing_manifest.json')
+
+            # keep entries of subjects that are not written in this call (e.g., other sub_ids)
+            manifest = {}
+            if os.path.exists(manifest_file):
+                with open(manifest_file, 'r') as f:
+                    manifest = json.load(f)
+
+            with stage('events.hash_inputs', key=self.task_id, rows=len(self.sub_ids)):
+                hashes = {sub_identifier: _timing_hash(self.event_files[sub_identifier], task_id=self.task_id,
+                                                       trial_type_cols=list(trial_type_cols), trimTRby=trimTRby,
+                                                       software=software, sort_df_by=sort_df_by)
+                          for sub_identifier in self.sub_ids}
+
+            # skip subjects with unchanged inputs whose timing files are all still there
+            to_write = [sub_identifier for sub_identifier in self.sub_ids
+                        if not (incremental and sub_identifier in manifest and manifest[sub_identifier]['hash'] == hashes[sub_identifier]
+                                and all(os.path.exists(f) for f in manifest[sub_identifier]['files']))]
+
+            args = [(sub_identifier, self.events_dict[self.task_id][sub_identifier]['onsets'],
+                     self.events_dict[self.task_id][sub_identifier]['durations'], self.task_id, len(trial_type_cols) > 0, output_dir, self.base_dir)
+                    for sub_identifier in to_write]
+            with stage('events.write_subjects', key=self.task_id, columns=len(to_write)):
+                written_files = self._map_subjects(_write_timing, args, n_jobs, parallel)
+
+            for sub_identifier, files in zip(to_write, written_files):
+                manifest[sub_identifier] = {'hash': hashes[sub_identifier], 'files': files}
+            with open(manifest_file + '.tmp', 'w') as f:
+                json.dump(manifest, f)
+            os.replace(manifest_file + '.tmp', manifest_file)
+
+            if timing_table:
+                events_table.to_csv(os.path.join(timing_dir, f'task-{self.task_id}_timing.tsv'), sep='\t', index=False)
+
+    def gen_DesignMat(self, TR, n_scans, trial_type_col='trial_type', oversampling=16, hrf=None, chunk_size=1024, cache_file=None):
+        '''
+        Builds HRF-convolved regressors for each condition in trial_type_col
+        from the events in get_timing() (or get_events_table()), for all
+        subjects and runs at once.
+
+        n_scans is the number of volumes per run (int, or {sub_id: {run:
+        n_scans}}). Boxcars are built on a grid oversampled `oversampling`
+        times per TR, convolved with hrf (default: spm_hrf()) using batched
+        FFTs of chunk_size regressors, and sampled at each scan onset.
+
+        Returns (and stores in self.design_matrix) a DataFrame indexed by
+        (subject, run, scan) with one column per condition. If cache_file is
+        given, the design matrix is saved there and reused while the events
+        and parameters are unchanged.
+        '''
+        assert hasattr(self, 'events_table'), "run get_timing() or get_events_table() first"
+
+        events_table = self.events_table[(self.events_table['column'] == trial_type_col)
+                                         & self.events_table['condition'].notna()]
+        assert len(events_table) > 0, f"no events in {trial_type_col} column"
+
+        if hrf is None:
+            hrf = spm_hrf(TR, oversampling)
+
+        cache_key = None
+        if cache_file is not None:
+            cache_key = hashlib.blake2b(repr((TR, n_scans, trial_type_col, oversampling, np.asarray(hrf).tobytes())).encode()
+                                        + pd.util.hash_pandas_object(events_table, index=False).to_numpy().tobytes(),
+                                        digest_size=16).hexdigest()
+            if os.path.exists(cache_file):
+                cached = pd.read_pickle(cache_file)
+                if cached['key'] == cache_key:
+                    self.design_matrix = cached['design_matrix']
+                    return self.design_matrix
+
+        # one regressor per subject, run and condition
+        # runs without a run entity (None, NaN in the categorical) are kept and mapped back to None
+        grouped = events_table.groupby(['subject', 'run', 'condition'], observed=True, dropna=False)
+        regressor = grouped.ngroup().to_numpy()
+        regressor_keys = [(sub_identifier, None if pd.isna(run_identifier) else run_identifier, condition)
+                          for sub_identifier, run_identifier, condition in grouped.size().index]
+        n_regressors = len(regressor_keys)
+
+        if isinstance(n_scans, dict):
+            run_scans = np.array([n_scans[sub_identifier][run_identifier] for sub_identifier, run_identifier, _ in regressor_keys])
+        else:
+            run_scans = np.full(n_regressors, n_scans)
+        n_fine = run_scans.max() * oversampling
+
+        # boxcars: +1 at each onset and -1 at each offset on the fine grid, then cumulative sum
+        dt = TR / oversampling
+        onsets = events_table['onset'].to_numpy(dtype=float)
+        durations = events_table['duration'].to_numpy(dtype=float)
+        event_end = run_scans[regressor] * oversampling
+        start = np.clip(np.round(onsets / dt).astype(int), 0, event_end)
+        stop = np.clip(np.maximum(np.round((onsets + durations) / dt).astype(int), start + 1), 0, event_end)
+
+        boxcars = np.zeros((n_regressors, n_fine + 1))
+        np.add.at(boxcars, (regressor, start), 1)
+        np.add.at(boxcars, (regressor, stop), -1)
+        boxcars = np.cumsum(boxcars[:, :n_fine], axis=1)
+
+        # convolve in batches with FFTs, then sample at scan onsets
+        n_fft = 1 << int(np.ceil(np.log2(n_fine + len(hrf) - 1)))
+        hrf_fft = np.fft.rfft(hrf, n_fft)
+        regressors = np.empty((n_regressors, run_scans.max()))
+        for first in range(0, n_regressors, chunk_size):
+            chunk = np.fft.irfft(np.fft.rfft(boxcars[first:first + chunk_size], n_fft) * hrf_fft, n_fft)
+            regressors[first:first + chunk_size] = chunk[:, :n_fine:oversampling]
+
+        # place each regressor in its (subject, run) rows and condition column
+        run_lengths = {(sub_identifier, run_identifier): length
+                       for (sub_identifier, run_identifier, _), length in zip(regressor_keys, run_scans)}
+        run_offsets = dict(zip(run_lengths, np.cumsum([0] + list(run_lengths.values()))))
+        conditions = sorted(set(condition for _, _, condition in regressor_keys), key=str)
+        condition_col = {condition: i for i, condition in enumerate(conditions)}
+
+        design = np.zeros((sum(run_lengths.values()), len(conditions)))
+        for i_regressor, (sub_identifier, run_identifier, condition) in enumerate(regressor_keys):
+            offset = run_offsets[(sub_identifier, run_identifier)]
+            length = run_scans[i_regressor]
+            design[offset:offset + length, condition_col[condition]] = regressors[i_regressor, :length]
+
+        index = pd.MultiIndex.from_tuples([(sub_identifier, run_identifier, scan)
+                                           for (sub_identifier, run_identifier), length in run_lengths.items()
+                                           for scan in range(length)], names=['subject', 'run', 'scan'])
+        self.design_matrix = pd.DataFrame(design, index=index, columns=conditions)
+
+        if cache_file is not None:
+            pd.to_pickle({'key': cache_key, 'design_matrix': self.design_matrix}, cache_file)
+
+        return self.design_matrix
 
     # def bunch_timing(self, trial_type):
         
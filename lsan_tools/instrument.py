@@ -0,0 +1,197 @@
+"""
+Opt-in timing and memory instrumentation of the survey and events pipelines.
+
+Stages (e.g., file parsing, scoring, BIDS indexing, timing-file writes) are
+only recorded while a profiler is running:
+
+    from lsan_tools.instrument import profiler
+
+    with profiler(memory=True) as prof:
+        data = survey('survey.csv', 'PIN')
+        data.score_all()
+    prof.report()   # one row per stage (and per scale or subject)
+    prof.summary()  # totals per stage
+
+When no profiler is running, stage() returns a shared no-op object, so
+instrumented code only pays for one function call per stage.
+"""
+import json
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+__all__ = ['profiler', 'stage']
+
+REPORT_COLUMNS = ['stage', 'key', 'parent', 'depth', 'start', 'seconds', 'rows', 'columns',
+                  'memory_delta', 'peak_memory', 'error']
+
+_active = None # running profiler (None: instrumentation is disabled)
+
+class _null_stage(object):
+    # returned by stage() while no profiler is running
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, rows=None, columns=None):
+        pass
+
+_NULL_STAGE = _null_stage()
+
+def stage(name, key=None, rows=None, columns=None):
+    '''
+    Context manager that records one stage in the running profiler, e.g.
+    `with stage('survey.read', key=filename) as s: ...; s.set(rows=n)`.
+    key identifies the scale, subject or file; rows/columns processed can be
+    given here or set() inside the block. Stages can be nested.
+    '''
+    if _active is None:
+        return _NULL_STAGE
+    return _stage(_active, name, key, rows, columns)
+
+class _stage(object):
+
+    def __init__(self, profiler, name, key=None, rows=None, columns=None):
+        self.profiler = profiler
+        self.record = {'stage': name, 'key': key, 'rows': rows, 'columns': columns}
+        self.child_peak = 0
+
+    def set(self, rows=None, columns=None):
+        ''' sets the number of rows/columns processed in this stage '''
+        if rows is not None:
+            self.record['rows'] = rows
+        if columns is not None:
+            self.record['columns'] = columns
+
+    def __enter__(self):
+        stack = self.profiler._stack()
+        self.record['parent'] = stack[-1].record['stage'] if stack else None
+        self.record['depth'] = len(stack)
+
+        if self.profiler.memory:
+            # keep the enclosing stage's peak before measuring this one
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].child_peak = max(stack[-1].child_peak, peak)
+            tracemalloc.reset_peak()
+            self.memory_start = current
+
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        stack = self.profiler._stack()
+        stack.pop()
+
+        record = self.record
+        record['start'] = self.start - self.profiler.start_time
+        record['seconds'] = seconds
+        record['memory_delta'] = record['peak_memory'] = None
+        if self.profiler.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, self.child_peak)
+            if stack:
+                stack[-1].child_peak = max(stack[-1].child_peak, peak)
+            tracemalloc.reset_peak()
+            record['memory_delta'] = current - self.memory_start
+            record['peak_memory'] = peak - self.memory_start
+        record['error'] = None if exc_type is None else exc_type.__name__
+
+        self.profiler._add(record)
+        return False
+
+class profiler(object):
+    '''
+    Records the wall time (seconds), rows/columns processed and, if memory,
+    the change in allocated memory and peak memory above the start of each
+    stage (bytes, via tracemalloc) while running (`with profiler(): ...` or
+    start()/stop()).
+
+    Each callback is called with a stage's record (dict) as soon as the
+    stage finishes, e.g. to log slow stages of a nightly run.
+
+    memory=True traces every allocation, which slows down allocation-heavy
+    stages (e.g., writing .csv files) several times; profile time and
+    memory in separate runs when timings matter.
+
+    Stages run in worker processes (n_jobs > 1 with parallel='process') are
+    not recorded; with threads, memory is shared by all threads.
+    '''
+
+    def __init__(self, memory=False, callbacks=None):
+        self.memory = memory
+        self.callbacks = list(callbacks or [])
+        self.records = []
+        self.start_time = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._previous = None
+        self._tracing = False
+
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def _stack(self):
+        # stages currently open in this thread
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _add(self, record):
+        with self._lock:
+            self.records.append(record)
+        for callback in self.callbacks:
+            callback(record)
+
+    def start(self):
+        global _active
+
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        self.start_time = time.perf_counter()
+        self._previous, _active = _active, self
+        return self
+
+    def stop(self):
+        global _active
+
+        _active = self._previous
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def report(self):
+        ''' returns a DataFrame with one row per recorded stage, in order of completion '''
+        return pd.DataFrame(self.records, columns=REPORT_COLUMNS)
+
+    def summary(self):
+        ''' returns calls, total seconds and rows, and maximum peak memory per stage '''
+        return (self.report()
+                .groupby('stage', sort=False)
+                .agg(calls=('seconds', 'size'), seconds=('seconds', 'sum'), rows=('rows', 'sum'),
+                     peak_memory=('peak_memory', 'max'))
+                .sort_values('seconds', ascending=False))
+
+    def to_json(self, filename=None):
+        ''' returns the records as a JSON string (and writes them to filename) '''
+        report_json = json.dumps({'records': self.records}, default=str)
+        if filename is not None:
+            with open(filename, 'w') as f:
+                f.write(report_json)
+        return report_json
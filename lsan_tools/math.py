@@ -1,18 +1,66 @@
+import os
+import json
+import hashlib
 import pandas as pandas
 import numpy as np
-from sklearn.metrics import pairwise_distances
-from sklearn.preprocessing import StandardScaler
-from scipy import stats
-import seaborn as sns
-import matplotlib.pyplot as plt
 
-def normalize_btwn_0_1(list_obj):
+def normalize_btwn_0_1(list_obj, axis=None, dtype=None, out=None):
     """
     Takes a list and normalizes the values from 0 (smallest) to 1(largest)
+
+    For 2-D input, axis=0 normalizes each column separately. The result is
+    float64 unless the input is already floating point or dtype is given;
+    pass out= (which may be the input array itself) to write the result
+    into an existing array instead of allocating a new one.
     """
-    return (list_obj-min(list_obj))/(max(list_obj)-min(list_obj))
+    if isinstance(list_obj, pandas.Series):
+        values = normalize_btwn_0_1(list_obj.to_numpy(), axis, dtype, out)
+        return pandas.Series(values, index=list_obj.index, name=list_obj.name)
+
+    list_obj = np.asarray(list_obj)
+    if dtype is None:
+        dtype = out.dtype if out is not None else (list_obj.dtype if list_obj.dtype.kind == 'f' else np.float64)
+
+    obj_min = list_obj.min(axis=axis, keepdims=axis is not None)
+    obj_max = list_obj.max(axis=axis, keepdims=axis is not None)
+
+    out = np.subtract(list_obj, obj_min, out=out, dtype=dtype)
+    out /= (obj_max-obj_min)
+    return out
+
+# Pairwise similarity models: each takes two arrays of (normalized) scores and
+# returns the elementwise similarity, so they broadcast over pairs or blocks.
+# With out=, the result is written into an existing array without temporaries.
+def _low_alike(a, b, out=None):
+    return np.maximum(a, b, out=out)
+
+def _high_alike(a, b, out=None):
+    out = np.minimum(a, b, out=out)
+    return np.subtract(1, out, out=out)
+
+def _average(a, b, out=None):
+    out = np.add(a, b, out=out)
+    out /= 2
+    return out
+
+def _absolute_dist(a, b, out=None):
+    out = np.subtract(a, b, out=out)
+    return np.absolute(out, out=out)
 
-def get_pairwise(behav_vct,type="absolute-dist",norm=True):
+_PAIRWISE_MODELS = {
+    'low-alike': _low_alike,
+    'high-alike': _high_alike,
+    'average': _average,
+    'absolute-dist': _absolute_dist,
+}
+
+def _get_pairwise_model(type):
+    try:
+        return _PAIRWISE_MODELS[type]
+    except KeyError:
+        raise ValueError(f"`type` should be one of {list(_PAIRWISE_MODELS)}, got {type!r}")
+
+def get_pairwise(behav_vct,type="absolute-dist",norm=True,return_mtx=True,dtype=np.float64,out=None):
     
     """
     Takes a vector of behavioral scores (one per subject) and returns 
@@ -22,64 +70,523 @@ def get_pairwise(behav_vct,type="absolute-dist",norm=True):
         C) one formulation of the "AnnaK" principle 
             (i.e., high-high pairs are most alike, low-low pairs are most dissimilar, and high-low pairs show intermediate similarity).
             (all high scorers are alike, all low scorers are low-scoring in their own way)
+
+    If return_mtx=False, only the condensed upper triangle is computed and
+    returned (the n x n matrix is never built).
+
+    dtype sets the precision of the output (e.g., np.float32 halves memory).
+    out= is an existing array to fill: the n x n matrix if return_mtx=True,
+    otherwise the n*(n-1)/2 upper triangle (e.g., an np.memmap).
     """    
-    # Get dims
+    model = _get_pairwise_model(type)
+
+    behav_vct = np.asarray(behav_vct, dtype=dtype)
     n_subs = len(behav_vct)
     
-    # Initialize output
-    mtx = np.zeros((n_subs,n_subs))
-    
     if norm:
         behav_vct = normalize_btwn_0_1(behav_vct)
 
-    # Fill in matrix
-    for i in range(n_subs):
-        for j in range(n_subs):
-            if type == 'low-alike':
-                mtx[i,j] = max(behav_vct[i], behav_vct[j])
-                
-            elif type == 'high-alike':
-                mtx[i,j] = (1 - min(behav_vct[i], behav_vct[j])) #/n_subs
-                
-            elif type == 'average':
-                mtx[i,j] = (behav_vct[i]+behav_vct[j])/2
-                
-            elif type == 'absolute-dist':
-                mtx[i,j] = np.absolute(behav_vct[i]-behav_vct[j])
+    if not return_mtx:
+        # Compute upper triangle one row at a time (rows are contiguous in the vector)
+        if out is None:
+            out = np.empty(n_subs * (n_subs - 1) // 2, dtype=dtype)
+        assert out.shape == (n_subs * (n_subs - 1) // 2,), "out should have length n*(n-1)/2"
+
+        offset = 0
+        for i in range(n_subs - 1):
+            n_cols = n_subs - i - 1
+            model(behav_vct[i], behav_vct[i + 1:], out=out[offset:offset + n_cols])
+            offset += n_cols
+        return out
+
+    # Fill in matrix by broadcasting subjects against each other
+    assert out is None or out.shape == (n_subs, n_subs), "out should have shape (n, n)"
+    mtx = model(behav_vct[:, np.newaxis], behav_vct[np.newaxis, :], out=out)
                 
-    # Compute upper triangle            
-    vct = mtx[np.triu_indices(mtx.shape[0], k=1)]
+    # Compute upper triangle (row by row, so no n x n index arrays are built)
+    vct = np.empty(n_subs * (n_subs - 1) // 2, dtype=mtx.dtype)
+    offset = 0
+    for i in range(n_subs - 1):
+        vct[offset:offset + n_subs - i - 1] = mtx[i, i + 1:]
+        offset += n_subs - i - 1
     
     return vct, mtx
 
-def shuffle(df, type="pandas"):
+def get_pairwise_multi(behav_mtx, type="absolute-dist", norm=True):
+    """
+    Takes a subjects x measures array (or DataFrame, e.g., from
+    survey.join_data(save=False)) and returns a measures x pairs array where
+    each row is the upper triangle from get_pairwise() for that measure.
+
+    Non-numeric DataFrame columns are dropped; rows follow the order of the
+    remaining columns. Triangle indices are computed once for all measures.
+    """
+    model = _get_pairwise_model(type)
+
+    if isinstance(behav_mtx, pandas.DataFrame):
+        behav_mtx = behav_mtx.select_dtypes(include='number')
+
+    behav_mtx = np.asarray(behav_mtx, dtype=float)
+    if behav_mtx.ndim == 1:
+        behav_mtx = behav_mtx[:, np.newaxis]
+
+    if norm:
+        behav_mtx = normalize_btwn_0_1(behav_mtx, axis=0)
+
+    n_subs, n_measures = behav_mtx.shape
+    rows, cols = np.triu_indices(n_subs, k=1)
+
+    vcts = np.empty((n_measures, len(rows)))
+    for i_measure in range(n_measures):
+        measure = behav_mtx[:, i_measure]
+        vcts[i_measure] = model(measure[rows], measure[cols])
+
+    return vcts
+
+def get_pairwise_topk(behav_vct, k=10, type="absolute-dist", norm=True, largest=False, chunk_size=65536):
+    """
+    Returns each subject's k nearest peers under a get_pairwise() model
+    without building the n x n matrix, as COO-style arrays:
+        indices: 2 x (n*k) array of (subject, peer) positions
+        values: the model value for each pair (same order)
+    e.g., scipy.sparse.coo_matrix((values, indices), shape=(n, n)).
+
+    Peers are those with the smallest model values (most alike for
+    "absolute-dist", "low-alike" and "high-alike"); largest=True returns the
+    largest values instead. Ties are broken by score order.
+
+    For a fixed subject every model is monotonic (or, for absolute-dist,
+    V-shaped) in the peer's score, so after one sort the candidates are the
+    k neighbors on either side plus the k+1 lowest and highest scorers.
+    This takes O(n log n + n*k) time, and chunk_size subjects are processed
+    at a time to bound memory.
+    """
+    model = _get_pairwise_model(type)
+
+    behav_vct = np.asarray(behav_vct, dtype=float)
+    n_subs = len(behav_vct)
+    assert 0 < k < n_subs, "k should be between 1 and the number of subjects - 1"
+
+    if norm:
+        behav_vct = normalize_btwn_0_1(behav_vct)
+
+    order = np.argsort(behav_vct, kind='stable')
+    sorted_vct = behav_vct[order]
+
+    # candidate positions (in score order): local window and both ends
+    window = np.arange(-k, k + 1)
+    ends = np.clip(np.r_[np.arange(k + 1), np.arange(n_subs - k - 1, n_subs)], 0, n_subs - 1)
+    sign = -1 if largest else 1
+
+    peers = np.empty((n_subs, k), dtype=np.intp)
+    values = np.empty((n_subs, k))
+    for start in range(0, n_subs, chunk_size):
+        pos = np.arange(start, min(start + chunk_size, n_subs))
+        cand = np.concatenate([np.clip(pos[:, np.newaxis] + window, 0, n_subs - 1),
+                               np.broadcast_to(ends, (len(pos), len(ends)))], axis=1)
+        cand.sort(axis=1)
+
+        # drop the subject itself and candidates that appear twice
+        invalid = cand == pos[:, np.newaxis]
+        invalid[:, 1:] |= cand[:, 1:] == cand[:, :-1]
+
+        cand_values = model(sorted_vct[pos, np.newaxis], sorted_vct[cand])
+        best = np.argsort(np.where(invalid, np.inf, sign * cand_values), axis=1, kind='stable')[:, :k]
+
+        peers[order[pos]] = order[np.take_along_axis(cand, best, axis=1)]
+        values[order[pos]] = np.take_along_axis(cand_values, best, axis=1)
+
+    indices = np.vstack([np.repeat(np.arange(n_subs), k), peers.ravel()])
+
+    return indices, values.ravel()
+
+def get_pairwise_blocked(behav_vct, filename, type="absolute-dist", norm=True, output="condensed",
+                         block_size=1024, dtype=np.float64, resume=True):
+    """
+    Out-of-core version of get_pairwise(): computes the similarity matrix in
+    blocks of `block_size` rows and writes them to a memory-mapped file, so
+    only one block is held in memory at a time.
+
+    output="condensed" writes the upper triangle (same order as get_pairwise),
+    output="square" writes the full n x n matrix. Progress is tracked in
+    `filename + '.progress.json'`; with resume=True a partially finished run
+    with the same parameters and behav_vct values continues from the last
+    completed block.
+
+    Returns the np.memmap and a dict with run information, including the
+    peak memory (bytes) allocated while computing.
+    """
+    import tracemalloc
+
+    assert output in ("condensed", "square"), "output should be 'condensed' or 'square'"
+    model = _get_pairwise_model(type)
+
+    behav_vct = np.ascontiguousarray(behav_vct, dtype=float)
+    n_subs = len(behav_vct)
+    # a different input of the same length must not resume the previous run's blocks
+    data_hash = hashlib.blake2b(behav_vct.tobytes(), digest_size=16).hexdigest()
+
+    if norm:
+        behav_vct = normalize_btwn_0_1(behav_vct)
+
+    if output == "condensed":
+        shape = (n_subs * (n_subs - 1) // 2,)
+    else:
+        shape = (n_subs, n_subs)
+
+    params = {'n_subs': n_subs, 'type': type, 'norm': norm, 'output': output,
+              'block_size': block_size, 'dtype': np.dtype(dtype).str, 'data_hash': data_hash}
+    progress_file = filename + ".progress.json"
+
+    completed = []
+    if resume and os.path.exists(filename) and os.path.exists(progress_file):
+        with open(progress_file, 'r') as f:
+            progress = json.load(f)
+        if progress['params'] == params:
+            completed = progress['completed']
+
+    out = np.memmap(filename, dtype=dtype, mode='r+' if completed else 'w+', shape=shape)
+
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+
+    for start in range(0, n_subs, block_size):
+        if start in completed:
+            continue
+        stop = min(start + block_size, n_subs)
+        block = model(behav_vct[start:stop, np.newaxis], behav_vct[np.newaxis, :])
+
+        if output == "square":
+            out[start:stop, :] = block
+        else:
+            # rows of the upper triangle are contiguous in the condensed vector
+            offset = start * n_subs - start * (start + 1) // 2
+            for i, row in enumerate(block):
+                row = row[start + i + 1:]
+                out[offset:offset + len(row)] = row
+                offset += len(row)
+
+        out.flush()
+        completed.append(start)
+        with open(progress_file + ".tmp", 'w') as f:
+            json.dump({'params': params, 'completed': completed}, f)
+        os.replace(progress_file + ".tmp", progress_file)
+
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    if not tracing:
+        tracemalloc.stop()
+
+    info = {'filename': filename, 'shape': shape, 'n_blocks': len(completed),
+            'peak_memory': peak_memory}
+
+    return out, info
+
+def shuffle(df, type="pandas", random_state=None, copy=True, dtype=None, out=None):
     """
     Take a DataFrame where the columns are variables and the 
     observations are the rows (e.g., row indices are subject IDs),
     and randomly shuffles the row indices.
+
+    random_state can be a seed or numpy.random.Generator (default: numpy's
+    global random state).
+
+    With type="pandas", copy=False returns a view that shares data with df
+    (only the index is new). With type="numpy", rows are gathered directly
+    into out= (or a new array of `dtype`) without an intermediate copy.
     """
-    if type == "pandas":
-        perm_data = df.copy()
-        perm_data['new_id'] = np.random.permutation(perm_data.index)
+    rng = np.random if random_state is None else np.random.default_rng(random_state)
 
-        # assign new index
-        perm_data.index = (perm_data['new_id'])
-        
-        # get rid of index name
-        perm_data.index.name = None
+    if type == "pandas":
+        perm_data = df.copy(deep=copy)
 
-        # get rid of added column
-        perm_data = perm_data.drop(['new_id'], axis=1)
+        # assign new index (without an index name)
+        perm_data.index = pandas.Index(rng.permutation(perm_data.index))
 
     elif type == "numpy":
-        perm_data = np.random.permutation(df)
+        values = np.asarray(df)
+        if out is None:
+            out = np.empty(values.shape, dtype=values.dtype if dtype is None else dtype)
+        # mode='clip' lets take() write into out directly (mode='raise' buffers it)
+        perm_data = np.take(values, rng.permutation(len(values)), axis=0, out=out, mode='clip')
 
     # Now have subjects x variables DataFrame with subject IDs randomly shuffled.
     return perm_data
 
-def zscore_df(df, var_list):
+def permutation_indices(n_subs, n_perm, random_state=None):
+    """
+    Returns an n_perm x n_subs array where each row is a random permutation
+    of range(n_subs), drawn from a numpy.random.Generator.
+    """
+    rng = np.random.default_rng(random_state)
+    dtype = np.int32 if n_subs**2 < 2**31 else np.int64
+    return rng.permuted(np.tile(np.arange(n_subs, dtype=dtype), (n_perm, 1)), axis=1)
+
+def _condensed_to_square(vct, n_subs):
+    # symmetric n x n matrix with zero diagonal from an upper triangle
+    mtx = np.zeros((n_subs, n_subs))
+    rows, cols = np.triu_indices(n_subs, k=1)
+    mtx[rows, cols] = vct
+    mtx[cols, rows] = vct
+    return mtx
+
+def _n_subs_from_condensed(vct):
+    n_pairs = len(vct)
+    n_subs = int(round((1 + np.sqrt(1 + 8 * n_pairs)) / 2))
+    assert n_subs * (n_subs - 1) // 2 == n_pairs, "vector is not a condensed upper triangle"
+    return n_subs
+
+def _standardize_vct(vct, method):
+    from scipy import stats
+
+    vct = np.asarray(vct, dtype=float)
+    if method == "spearman":
+        vct = stats.rankdata(vct)
+    elif method != "pearson":
+        raise ValueError("method should be 'pearson' or 'spearman'")
+    return (vct - vct.mean()) / vct.std()
+
+# state shared with permutation workers (set once per process)
+_mantel_state = {}
+
+def _init_mantel_worker(x_z, y_z, n_subs, batch_size):
+    # y_lookup[i * n_subs + j] is the standardized y of pair (i, j), in either order
+    index_dtype = np.int32 if n_subs**2 < 2**31 else np.int64
+    _mantel_state.update(x_z=x_z,
+                         y_lookup=_condensed_to_square(y_z, n_subs).ravel(),
+                         cols=np.triu_indices(n_subs, k=1)[1].astype(index_dtype),
+                         row_lengths=np.arange(n_subs - 1, -1, -1),
+                         batch_size=batch_size)
+
+def _mantel_null_chunk(n_perm, seed):
+    x_z = _mantel_state['x_z']
+    y_lookup = _mantel_state['y_lookup']
+    cols = _mantel_state['cols']
+    row_lengths = _mantel_state['row_lengths']
+    batch_size = min(_mantel_state['batch_size'], n_perm)
+    n_subs = len(row_lengths)
+
+    perms = permutation_indices(n_subs, n_perm, seed).astype(cols.dtype)
+
+    pair_idx = np.empty(len(x_z), dtype=cols.dtype)
+    y_perm = np.empty((batch_size, len(x_z)))
+    null = np.empty(n_perm)
+    for start in range(0, n_perm, batch_size):
+        batch = perms[start:start + batch_size]
+        for i_perm, perm in enumerate(batch):
+            # permuted pair (perm[i], perm[j]) of each condensed pair (i, j), gathered from y
+            # (mode='clip' lets take() write straight into out; indices are always in range)
+            np.take(perm, cols, out=pair_idx, mode='clip')
+            pair_idx += np.repeat(perm * n_subs, row_lengths)
+            np.take(y_lookup, pair_idx, out=y_perm[i_perm], mode='clip')
+        # score the whole batch in one matrix-vector product
+        null[start:start + len(batch)] = y_perm[:len(batch)] @ x_z / len(x_z)
+
+    return null
+
+def mantel(x_vct, y_vct, n_perm=10000, method="pearson", tail=2, random_state=None,
+           n_jobs=1, chunk_size=250, batch_size=None):
+    """
+    Mantel test (e.g., inter-subject RSA) between two condensed similarity
+    vectors (upper triangles, as returned by get_pairwise()). Subjects in
+    y_vct are permuted by re-indexing only: each permuted condensed y_vct is
+    gathered straight from a subject-pair lookup table (built once per
+    worker), with no n x n matrix per permutation, and `batch_size`
+    permutations are scored in one matrix-vector product (default: ~32 MB
+    of gathered pairs per batch).
+
+    Permutations are split into chunks of `chunk_size`, each with its own
+    seed spawned from random_state, and spread over `n_jobs` processes
+    (-1 for all CPUs), so results are identical for any n_jobs.
+
+    Returns the observed correlation, p-value, and null distribution.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    assert len(x_vct) == len(y_vct), "x_vct and y_vct should be the same length"
+    assert tail in (1, 2), "tail should be 1 or 2"
+
+    n_subs = _n_subs_from_condensed(x_vct)
+    if batch_size is None:
+        batch_size = max(1, 2**22 // max(len(x_vct), 1))
+
+    x_z = _standardize_vct(x_vct, method)
+    y_z = _standardize_vct(y_vct, method)
+    r = x_z @ y_z / len(x_z)
+
+    n_chunks = int(np.ceil(n_perm / chunk_size))
+    chunk_perms = [min(chunk_size, n_perm - i * chunk_size) for i in range(n_chunks)]
+    seeds = np.random.SeedSequence(random_state).spawn(n_chunks)
+
+    if n_jobs == 1:
+        _init_mantel_worker(x_z, y_z, n_subs, batch_size)
+        null = [_mantel_null_chunk(n, seed) for n, seed in zip(chunk_perms, seeds)]
+    else:
+        n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_mantel_worker,
+                                 initargs=(x_z, y_z, n_subs, batch_size)) as pool:
+            null = list(pool.map(_mantel_null_chunk, chunk_perms, seeds))
+    null = np.concatenate(null) if null else np.empty(0)
+
+    if tail == 2:
+        p = (np.sum(np.abs(null) >= np.abs(r)) + 1) / (n_perm + 1)
+    else:
+        p = (np.sum(null >= r) + 1) / (n_perm + 1)
+
+    return r, p, null
+
+def isrsa(behav_vct, brain_vcts, method="spearman", chunk_size=256):
+    """
+    Correlates one behavioral upper triangle (e.g., from get_pairwise())
+    with many brain similarity upper triangles at once (one per ROI,
+    parcel or searchlight center).
+
+    brain_vcts is a ROIs x pairs array, e.g., a float32 np.memmap; it is
+    read `chunk_size` ROIs at a time, so memory stays bounded. Each chunk is
+    rank-transformed (for spearman) and standardized, then correlated with
+    the behavioral vector in one matrix multiply.
+
+    Returns an array with one correlation per ROI.
+    """
+    from scipy import stats
+
+    behav_z = _standardize_vct(behav_vct, method)
+    n_rois, n_pairs = brain_vcts.shape
+    assert n_pairs == len(behav_z), "brain_vcts should be ROIs x pairs with the same pairs as behav_vct"
+
+    r = np.empty(n_rois)
+    for start in range(0, n_rois, chunk_size):
+        # new arrays only: a float64 input (or r+ memmap) must not be standardized in place
+        if method == "spearman":
+            chunk = stats.rankdata(brain_vcts[start:start + chunk_size], axis=1)
+        else:
+            chunk = np.array(brain_vcts[start:start + chunk_size], dtype=float, copy=True)
+        chunk -= chunk.mean(axis=1, keepdims=True)
+        chunk /= chunk.std(axis=1, keepdims=True)
+        r[start:start + chunk_size] = chunk @ behav_z / n_pairs
+
+    return r
+
+def zscore_df(df, var_list, dtype=np.float64, out=None):
     """ 
     Takes DateFrame and z-scores values within each of the columns
+
+    Each column is standardized straight into the output array (a new
+    `dtype` array or out=), so no intermediate copy of df is made.
+    Missing values are ignored when computing means and SDs.
     """
-    scaler = StandardScaler()
-    return scaler.fit_transform(df[var_list])
\ No newline at end of file
+    if out is None:
+        out = np.empty((len(df), len(var_list)), dtype=dtype)
+    assert out.shape == (len(df), len(var_list)), "out should have shape (len(df), len(var_list))"
+
+    for i_var, var in enumerate(var_list):
+        values = df[var]
+        if isinstance(values.dtype, np.dtype):
+            values = values.to_numpy()
+        else: # nullable extension dtypes (e.g., compacted Int8 items)
+            values = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        var_mean = np.nanmean(values, dtype=np.float64)
+        var_std = np.nanstd(values, dtype=np.float64)
+
+        np.subtract(values, var_mean, out=out[:, i_var], casting='unsafe')
+        if var_std > 0:
+            out[:, i_var] /= var_std
+
+    return out
+
+class online_scaler(object):
+    """
+    Z-scores columns of DataFrames that arrive in chunks: partial_fit()
+    accumulates each column's count, mean and sum of squared deviations
+    with a numerically stable (Welford/Chan) update, and transform()
+    returns a labeled DataFrame of z-scores (population SD, as in
+    zscore_df()). With group_by (column name or list), statistics are kept
+    separately for each group (e.g., site or wave).
+
+    Fitted statistics can be saved with to_json() and restored with
+    online_scaler.from_json() to standardize later batches.
+    """
+
+    def __init__(self, var_list, group_by=None):
+        self.var_list = list(var_list)
+        self.group_by = group_by
+        self.n = None
+        self.mean = None
+        self.m2 = None
+
+    def _group_keys(self, df):
+        if self.group_by is None:
+            return pandas.Index(np.zeros(len(df), dtype=int))
+        if isinstance(self.group_by, list):
+            return pandas.MultiIndex.from_frame(df[self.group_by])
+        return pandas.Index(df[self.group_by])
+
+    def partial_fit(self, df):
+        """ Updates statistics with a chunk of rows (missing values are skipped) """
+        grouped = df[self.var_list].groupby(self._group_keys(df))
+        chunk_n = grouped.count().astype(float)
+        chunk_mean = grouped.mean()
+        chunk_m2 = grouped.var(ddof=0) * chunk_n
+
+        if self.n is None:
+            self.n, self.mean, self.m2 = chunk_n, chunk_mean.fillna(0), chunk_m2.fillna(0)
+            return self
+
+        # merge running and chunk statistics for every group seen so far
+        groups = self.n.index.union(chunk_n.index)
+        n_a, n_b = self.n.reindex(groups, fill_value=0), chunk_n.reindex(groups, fill_value=0)
+        mean_a, mean_b = self.mean.reindex(groups, fill_value=0), chunk_mean.reindex(groups).fillna(0)
+        m2_a, m2_b = self.m2.reindex(groups, fill_value=0), chunk_m2.reindex(groups).fillna(0)
+
+        n = n_a + n_b
+        delta = mean_b - mean_a
+        weight_b = (n_b / n).fillna(0)
+        self.mean = mean_a + delta * weight_b
+        self.m2 = m2_a + m2_b + delta**2 * n_a * weight_b
+        self.n = n
+        return self
+
+    def transform(self, df):
+        """ Returns z-scores of df[var_list] as a DataFrame with the same index """
+        assert self.n is not None, "call partial_fit() before transform()"
+
+        keys = self._group_keys(df)
+        mean = self.mean.reindex(keys).to_numpy(dtype=float)
+        scale = np.sqrt(self.m2 / self.n).reindex(keys).to_numpy(dtype=float, copy=True)
+        scale[scale == 0] = 1 # constant columns are centered only
+
+        return pandas.DataFrame((df[self.var_list].to_numpy(dtype=float) - mean) / scale,
+                                index=df.index, columns=self.var_list)
+
+    def to_json(self, filename=None):
+        """ Returns fitted statistics as a JSON string (and writes them to filename) """
+        params = {'var_list': self.var_list,
+                  'group_by': self.group_by,
+                  'groups': [list(g) if isinstance(g, tuple) else g for g in self.n.index.tolist()],
+                  'n': self.n.to_numpy().tolist(),
+                  'mean': self.mean.to_numpy().tolist(),
+                  'm2': self.m2.to_numpy().tolist()}
+        params_json = json.dumps(params)
+        if filename is not None:
+            with open(filename, 'w') as f:
+                f.write(params_json)
+        return params_json
+
+    @classmethod
+    def from_json(cls, params_json):
+        """ Restores a scaler from to_json() output (string or filename) """
+        if os.path.exists(params_json):
+            with open(params_json, 'r') as f:
+                params_json = f.read()
+        params = json.loads(params_json)
+
+        scaler = cls(params['var_list'], params['group_by'])
+        if isinstance(params['group_by'], list):
+            groups = pandas.MultiIndex.from_tuples([tuple(g) for g in params['groups']])
+        else:
+            groups = pandas.Index(params['groups'])
+        scaler.n = pandas.DataFrame(params['n'], index=groups, columns=scaler.var_list)
+        scaler.mean = pandas.DataFrame(params['mean'], index=groups, columns=scaler.var_list)
+        scaler.m2 = pandas.DataFrame(params['m2'], index=groups, columns=scaler.var_list)
+        return scaler
@@ -8,13 +8,16 @@ setuptools.setup(
     version="0.0.1",
     author="Shawn Rhoads",
     author_email="sr1209@sr1209@georgetown.edu",
-    install_requires = "pandas>=0.24",
+    install_requires = ["numpy>=1.20", "pandas>=1.1"],
+    python_requires=">=3.9",
+    extras_require = {"columnar": ["pyarrow"]},
     description="Python toolbox with general-purpose functions for behavioral and neuroimaging research",
     long_description=__long_description__,
     url="https://github.com/LabSocialAffectNeuro/lsan_tools",
     packages=setuptools.find_packages(exclude=['']),
+    entry_points={"console_scripts": ["lsan-score-surveys=lsan_tools.cli:main"]},
     classifiers=[
-        "Programming Language :: Python :: 3.6",
+        "Programming Language :: Python :: 3.9",
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
@@ -0,0 +1,68 @@
+"""
+Import-time regression tests: `import lsan_tools.behav` (and scoring surveys)
+must not load the heavy optional dependencies, and the import must stay
+within a startup budget.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ['bids', 'sklearn', 'scipy', 'matplotlib', 'seaborn']
+
+# seconds; override on slow machines with LSAN_IMPORT_BUDGET
+IMPORT_BUDGET = float(os.environ.get('LSAN_IMPORT_BUDGET', 0.5))
+STARTUP_BUDGET = float(os.environ.get('LSAN_STARTUP_BUDGET', 5.0))
+
+IMPORT_SCRIPT = """
+import json, sys, time
+import numpy, pandas  # shared with any pandas workflow, so not counted
+start = time.perf_counter()
+import lsan_tools.behav
+seconds = time.perf_counter() - start
+print(json.dumps({'seconds': seconds, 'modules': sorted(sys.modules)}))
+"""
+
+SCORE_SCRIPT = """
+import json, sys
+import numpy as np, pandas as pd
+from lsan_tools.behav import survey, SCALES
+items = {f"iri_{i}": np.arange(1, 6, dtype=float) for i in range(1, SCALES['iri']['n_items'] + 1)}
+data = survey(pd.DataFrame(dict(PIN=range(5), **items)), 'PIN')
+data.score_all()
+data.score_all(min_answered=0.5)
+print(json.dumps({'modules': sorted(sys.modules)}))
+"""
+
+def _env():
+    # import this checkout of lsan_tools, installed or not
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return dict(os.environ, PYTHONPATH=os.pathsep.join([package_dir, os.environ.get('PYTHONPATH', '')]))
+
+def _run_import(script):
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, env=_env(), check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test_behav_import_skips_heavy_modules():
+    modules = set(_run_import(IMPORT_SCRIPT)['modules'])
+    loaded = [name for name in HEAVY_MODULES if name in modules]
+    assert loaded == [], f"import lsan_tools.behav loaded {loaded}"
+
+def test_behav_scoring_skips_heavy_modules():
+    # survey-only installs have pandas and numpy, not scipy
+    modules = set(_run_import(SCORE_SCRIPT)['modules'])
+    loaded = [name for name in HEAVY_MODULES if name in modules]
+    assert loaded == [], f"scoring surveys loaded {loaded}"
+
+def test_behav_import_budget():
+    # best of three, to ignore one-off filesystem or scheduler delays
+    seconds = min(_run_import(IMPORT_SCRIPT)['seconds'] for _ in range(3))
+    assert seconds < IMPORT_BUDGET, f"import lsan_tools.behav took {seconds:.2f} s (budget {IMPORT_BUDGET} s)"
+
+def test_behav_startup_budget():
+    # wall time of a fresh interpreter running `import lsan_tools.behav`
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'import lsan_tools.behav'], env=_env(), check=True)
+    seconds = time.perf_counter() - start
+    assert seconds < STARTUP_BUDGET, f"python -c 'import lsan_tools.behav' took {seconds:.2f} s (budget {STARTUP_BUDGET} s)"
@@ -0,0 +1,68 @@
+"""
+Checks that the out=/copy=False paths in lsan_tools.math fill the given
+array (or share the data) without allocating another copy of it.
+"""
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from lsan_tools import math
+
+def _peak_memory(function, *args, **kwargs):
+    # returns (result, peak bytes allocated while running function)
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        result = function(*args, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+def test_normalize_in_place():
+    x = np.random.default_rng(0).normal(size=1_000_000)
+    expected = (x - x.min()) / (x.max() - x.min())
+
+    result, peak = _peak_memory(math.normalize_btwn_0_1, x, out=x)
+    assert result is x
+    assert peak < x.nbytes / 10
+    np.testing.assert_array_equal(x, expected)
+
+def test_get_pairwise_condensed_out():
+    behav_vct = np.random.default_rng(0).normal(size=1500)
+    buf = np.empty(len(behav_vct) * (len(behav_vct) - 1) // 2)
+
+    result, peak = _peak_memory(math.get_pairwise, behav_vct, return_mtx=False, out=buf)
+    assert result is buf
+    assert peak < buf.nbytes / 10
+    np.testing.assert_array_equal(buf, math.get_pairwise(behav_vct)[0])
+
+def test_get_pairwise_condensed_out_float32():
+    behav_vct = np.random.default_rng(0).normal(size=1500)
+    buf = np.empty(len(behav_vct) * (len(behav_vct) - 1) // 2, dtype=np.float32)
+
+    result, peak = _peak_memory(math.get_pairwise, behav_vct, return_mtx=False, dtype=np.float32, out=buf)
+    assert result is buf
+    assert peak < buf.nbytes / 10
+    np.testing.assert_allclose(buf, math.get_pairwise(behav_vct)[0], atol=1e-6)
+
+def test_shuffle_numpy_out():
+    data = np.random.default_rng(0).normal(size=(100_000, 10))
+    buf = np.empty_like(data)
+
+    result, peak = _peak_memory(math.shuffle, data, type="numpy", random_state=0, out=buf)
+    assert result is buf
+    assert peak < data.nbytes / 4 # only the permutation indices
+    np.testing.assert_array_equal(np.sort(buf[:, 0]), np.sort(data[:, 0]))
+    np.testing.assert_array_equal(buf, math.shuffle(data, type="numpy", random_state=0))
+
+def test_shuffle_pandas_no_copy():
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(rng.normal(size=(100_000, 10)), index=pd.Index(np.arange(100_000), name='PIN'))
+
+    result, peak = _peak_memory(math.shuffle, data, random_state=0, copy=False)
+    assert peak < data.memory_usage().sum() / 4 # only the new index
+    assert np.shares_memory(result[0].to_numpy(), data[0].to_numpy())
+    assert sorted(result.index) == list(data.index)
+    assert not result.index.equals(data.index)